@@ -0,0 +1,159 @@
+"""
+Compare the date and time slot normalization with the former per-row parsing.
+
+Builds a synthetic wide timetable (as returned by convert_tablelist_to_dataframe)
+spanning several semesters, runs the former melt -> regex month replacement ->
+to_datetime chain and the current one that parses every distinct date label
+and time slot header once, checks that both give the same rows and prints their
+run times. It also checks that melt_df matches DataFrame.melt when header labels
+repeat, as merged header cells produce.
+
+    python benchmarks/bench_normalize.py --semesters 20
+"""
+
+import argparse
+import random
+import time
+
+import pandas as pd
+from timetable_scraper.libs.camelot_raw_pdf_to_df import (
+    format_date,
+    melt_df,
+    split_time_slot,
+)
+
+GERMAN_MONTHS = [
+    "Jan",
+    "Feb",
+    "Mär",
+    "Apr",
+    "Mai",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Okt",
+    "Nov",
+    "Dez",
+]
+TIME_SLOTS = [
+    "08.00 - 09.30 Uhr",
+    "09.45 - 11.15 Uhr",
+    "11.30 - 13.00 Uhr",
+    "14.00 - 15.30 Uhr",
+    "15.45 - 17.15 Uhr",
+    "17.30 - 19.00 Uhr",
+]
+
+
+def make_wide_timetable(semesters=20, weeks=15, fill_ratio=0.6, seed=42):
+    """Wide timetable with German date labels, one row per day."""
+    rng = random.Random(seed)
+    start = pd.Timestamp("2024-03-18")
+    rows = []
+    for day in range(semesters * weeks * 5):
+        # Labels only carry day and month, so keep all days within one year
+        date = start + pd.Timedelta(days=(day // 5 * 7 + day % 5) % 280)
+        row = {"date": f"{date.day:02d}. {GERMAN_MONTHS[date.month - 1]}"}
+        for slot in TIME_SLOTS:
+            filled = rng.random() < fill_ratio
+            row[slot] = "Physik\nProf. Dr. Weber\nD 101" if filled else ""
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+########################################################################################
+#                                FORMER IMPLEMENTATION                                 #
+########################################################################################
+
+
+def format_date_regex(df, current_year):
+    month_mapping = {"Mär": "Mar", "Mai": "May", "Okt": "Oct", "Dez": "Dec"}
+    df["date"] = df["date"].replace(month_mapping, regex=True)
+    df["date"] = pd.to_datetime(
+        df["date"].astype(str) + " " + str(current_year),
+        format="%d. %b %Y",
+        errors="coerce",
+    )
+    return df
+
+
+def split_time_slot_to_datetime(df):
+    time_splits = (
+        df["time_slot"].str.replace(" Uhr", "").str.split(pat=" - ", n=1, expand=True)
+    )
+    df["start_time"] = pd.to_datetime(
+        time_splits[0].str.strip(), format="%H.%M"
+    ).dt.time
+    df["end_time"] = pd.to_datetime(
+        time_splits[1].str.strip(), format="%H.%M"
+    ).dt.time
+    idx = df.columns.get_loc("time_slot")
+    df.insert(idx, "start_time", df.pop("start_time"))
+    df.insert(idx + 1, "end_time", df.pop("end_time"))
+    return df.drop(columns="time_slot")
+
+
+def normalize_per_row(wide_df, year):
+    df = wide_df.melt(id_vars=["date"], var_name="time_slot", value_name="raw_details")
+    df = df[df["raw_details"] != ""]
+    df = split_time_slot_to_datetime(df)
+    return format_date_regex(df, year)
+
+
+def normalize_unique(wide_df, year):
+    df = melt_df(format_date(wide_df.copy(), year))
+    df = df[df["raw_details"] != ""]
+    return split_time_slot(df)
+
+
+def check_duplicate_headers(wide_df):
+    """melt_df must give the same rows as DataFrame.melt for repeated headers."""
+    columns = list(wide_df.columns)
+    columns[2] = columns[3] = ""
+    columns[5] = columns[1]
+    duplicated_df = wide_df.set_axis(columns, axis=1)
+    expected = duplicated_df.melt(
+        id_vars=["date"], var_name="time_slot", value_name="raw_details"
+    )
+    pd.testing.assert_frame_equal(
+        melt_df(duplicated_df).astype(object), expected.astype(object)
+    )
+
+
+def best_of(repeats, function, *args):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--semesters", type=int, default=20)
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    wide_df = make_wide_timetable(args.semesters)
+    check_duplicate_headers(wide_df)
+    per_row_time, expected = best_of(
+        args.repeats, normalize_per_row, wide_df, args.year
+    )
+    unique_time, result = best_of(args.repeats, normalize_unique, wide_df, args.year)
+    # Compared as objects: time_slot headers are no longer materialized per row
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True).astype(object),
+        expected.reset_index(drop=True).astype(object),
+    )
+
+    print(f"{len(wide_df)} days -> {len(result)} timetable rows")
+    print(f"per row:    {per_row_time * 1000:8.1f} ms")
+    speedup = per_row_time / unique_time
+    print(f"per unique: {unique_time * 1000:8.1f} ms ({speedup:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
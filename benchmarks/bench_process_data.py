@@ -0,0 +1,174 @@
+"""
+Compare the vectorized event assembly of process_data with the former iterrows loop.
+
+Builds a synthetic melted timetable spanning several semesters (no PDF, OpenAI
+or cache involved), checks that both implementations return the same events
+and prints their run times.
+
+    python benchmarks/bench_process_data.py --semesters 6
+"""
+
+import argparse
+import random
+import time
+
+import pandas as pd
+from timetable_scraper.libs.process_raw_data import (
+    PROCESSED_EVENTS_COLUMNS,
+    assemble_events,
+)
+from timetable_scraper.libs.timetable_event import events_from_df
+from timetable_scraper.libs.timetable_schema import (
+    LINE_SEPARATOR,
+    TIMETABLE_COLUMNS,
+    apply_timetable_schema,
+)
+
+TIME_SLOTS = [
+    ("08:00", "09:30"),
+    ("09:45", "11:15"),
+    ("11:30", "13:00"),
+    ("14:00", "15:30"),
+    ("15:45", "17:15"),
+    ("17:30", "19:00"),
+]
+COURSES = [
+    "Mathematik 2",
+    "Elektrotechnik",
+    "Programmieren",
+    "Physik",
+    "Regelungstechnik",
+    "Digitaltechnik",
+    "Englisch",
+    "Messtechnik",
+]
+LECTURERS = ["Prof. Dr. Müller", "Dr. Schmidt", "Prof. Dr. Weber", "Fischer"]
+ROOMS = ["D 101", "D 202", "C 014", "E 110", "Online"]
+
+
+def make_timetable(semesters=6, weeks=15, multi_event_ratio=0.1, seed=42):
+    """Melted timetable rows as produced by create_df_from_pdf."""
+    rng = random.Random(seed)
+    multi_cells = [
+        [
+            f"{course}, {lecturer}, {room}"
+            for course, lecturer, room in zip(
+                rng.sample(COURSES, 2), rng.sample(LECTURERS, 2), rng.sample(ROOMS, 2)
+            )
+        ]
+        for _ in range(20)
+    ]
+    start = pd.Timestamp("2020-03-16")
+    rows = []
+    for day in range(semesters * weeks * 5):
+        date = start + pd.Timedelta(days=day // 5 * 7 + day % 5)
+        for start_time, end_time in TIME_SLOTS:
+            if rng.random() < 0.3:
+                continue
+            if rng.random() < multi_event_ratio:
+                raw_details = rng.choice(multi_cells)
+                multi_event = True
+            else:
+                raw_details = [
+                    rng.choice(COURSES),
+                    rng.choice(LECTURERS),
+                    rng.choice(ROOMS),
+                ][: rng.choice([1, 2, 3, 3, 3])]
+                if rng.random() < 0.2:
+                    raw_details.append("Übung")
+                multi_event = False
+            cell = LINE_SEPARATOR.join(raw_details)
+            rows.append((date, start_time, end_time, cell, multi_event))
+    df = apply_timetable_schema(pd.DataFrame(rows, columns=TIMETABLE_COLUMNS))
+    parsed_details = {}
+    for cell in multi_cells:
+        events = []
+        for line in cell:
+            course, lecturer, location = line.split(", ")
+            events.append(
+                {
+                    "course": course,
+                    "lecturer": [lecturer],
+                    "location": location,
+                    "details": "",
+                }
+            )
+        parsed_details[", ".join(cell)] = events
+    return df, parsed_details
+
+
+def assemble_events_iterrows(df, parsed_details):
+    """The row-by-row loop process_data used before."""
+    processed_events = []
+    for _, row in df.iterrows():
+        raw_details = row["raw_details"].split(LINE_SEPARATOR)
+        if row["multi_event"]:
+            for event in parsed_details[", ".join(raw_details)]:
+                processed_events.append(
+                    {
+                        "date": row["date"],
+                        "start_time": row["start_time"],
+                        "end_time": row["end_time"],
+                        "course": event.get("course", ""),
+                        "lecturer": event.get("lecturer", []),
+                        "location": event.get("location", ""),
+                        "details": event.get("details", ""),
+                    }
+                )
+        else:
+            processed_events.append(
+                {
+                    "date": row["date"],
+                    "start_time": row["start_time"],
+                    "end_time": row["end_time"],
+                    "course": raw_details[0]
+                    if len(raw_details) > 0
+                    else "Unknown Course",
+                    "lecturer": [raw_details[1]]
+                    if len(raw_details) > 1
+                    else ["Unknown Lecturer"],
+                    "location": raw_details[2]
+                    if len(raw_details) > 2
+                    else "Unknown Location",
+                    "details": raw_details[3] if len(raw_details) > 3 else "",
+                }
+            )
+    return pd.DataFrame(processed_events, columns=PROCESSED_EVENTS_COLUMNS)
+
+
+def best_of(repeats, function, *args):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--semesters", type=int, default=6)
+    parser.add_argument("--multi-event-ratio", type=float, default=0.1)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    df, parsed_details = make_timetable(
+        args.semesters, multi_event_ratio=args.multi_event_ratio
+    )
+    iterrows_time, expected = best_of(
+        args.repeats, assemble_events_iterrows, df, parsed_details
+    )
+    vectorized_time, result = best_of(
+        args.repeats, assemble_events, df, dict(parsed_details)
+    )
+    # Compared as events: the result stores lecturers encoded in a categorical
+    assert events_from_df(result) == events_from_df(expected)
+
+    print(f"{len(df)} timetable rows -> {len(result)} events")
+    print(f"iterrows:   {iterrows_time * 1000:8.1f} ms")
+    speedup = iterrows_time / vectorized_time
+    print(f"vectorized: {vectorized_time * 1000:8.1f} ms ({speedup:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
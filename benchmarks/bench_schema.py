@@ -0,0 +1,111 @@
+"""
+Compare the memory of the melted timetable schema with the former list layout.
+
+Builds an archive-scale melted timetable (many semesters of several study
+programmes, no PDF involved) once with raw_details as Python lists of lines
+and object times, as create_df_from_pdf returned it before, and once in the
+current schema (flat Arrow string buffer, categorical times). Prints the deep
+memory usage of both and times the multi-event detection from the cell text
+(former: split into lists, then a lambda per row; now: a line count):
+
+    python benchmarks/bench_schema.py --semesters 20 --programmes 10
+"""
+
+import argparse
+import random
+import time
+from datetime import time as clock
+
+import pandas as pd
+from timetable_scraper.libs.timetable_schema import (
+    LINE_SEPARATOR,
+    TIMETABLE_COLUMNS,
+    apply_timetable_schema,
+    is_multi_event,
+)
+
+TIME_SLOTS = [
+    (clock(8, 0), clock(9, 30)),
+    (clock(9, 45), clock(11, 15)),
+    (clock(11, 30), clock(13, 0)),
+    (clock(14, 0), clock(15, 30)),
+    (clock(15, 45), clock(17, 15)),
+    (clock(17, 30), clock(19, 0)),
+]
+COURSES = ["Mathematik 2", "Elektrotechnik", "Programmieren", "Physik", "Messtechnik"]
+LECTURERS = ["Prof. Dr. Müller", "Dr. Schmidt", "Prof. Dr. Weber", "Fischer"]
+ROOMS = ["D 101", "D 202", "C 014", "E 110", "Online"]
+
+
+def make_list_timetable(semesters=20, programmes=10, weeks=15, seed=42):
+    """Melted timetable rows with raw_details as lists, one block per programme."""
+    rng = random.Random(seed)
+    start = pd.Timestamp("2014-03-17")
+    rows = []
+    for _ in range(programmes):
+        for day in range(semesters * weeks * 5):
+            date = start + pd.Timedelta(days=day // 5 * 7 + day % 5)
+            for start_time, end_time in TIME_SLOTS:
+                if rng.random() < 0.4:
+                    continue
+                lines = [rng.choice(COURSES), rng.choice(LECTURERS), rng.choice(ROOMS)]
+                if rng.random() < 0.1:
+                    lines += [rng.choice(COURSES), rng.choice(LECTURERS), "Übung"]
+                rows.append((date, start_time, end_time, lines))
+    df = pd.DataFrame(rows, columns=TIMETABLE_COLUMNS[:-1])
+    df["multi_event"] = df["raw_details"].apply(
+        lambda x: len(x) > 4 if isinstance(x, list) else False
+    )
+    return df
+
+
+def to_schema(list_df):
+    df = list_df.copy()
+    df["raw_details"] = df["raw_details"].map(LINE_SEPARATOR.join)
+    df = apply_timetable_schema(df)
+    df["multi_event"] = is_multi_event(df["raw_details"])
+    return df
+
+
+def best_of(repeats, function, *args):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--semesters", type=int, default=20)
+    parser.add_argument("--programmes", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    list_df = make_list_timetable(args.semesters, args.programmes)
+    schema_df = to_schema(list_df)
+    assert schema_df["multi_event"].equals(list_df["multi_event"])
+
+    list_mib = list_df.memory_usage(deep=True).sum() / 2**20
+    schema_mib = schema_df.memory_usage(deep=True).sum() / 2**20
+    print(f"{len(list_df)} timetable rows")
+    print(f"lists:  {list_mib:8.1f} MiB")
+    print(f"schema: {schema_mib:8.1f} MiB ({list_mib / schema_mib:.1f}x smaller)")
+
+    cells = schema_df["raw_details"]
+    lambda_time, expected = best_of(
+        args.repeats,
+        lambda: cells.str.split(LINE_SEPARATOR).apply(
+            lambda x: len(x) > 4 if isinstance(x, list) else False
+        ),
+    )
+    count_time, result = best_of(args.repeats, is_multi_event, cells)
+    assert result.equals(expected)
+    print(f"multi-event split + lambda: {lambda_time * 1000:8.1f} ms")
+    speedup = lambda_time / count_time
+    print(f"multi-event line count:     {count_time * 1000:8.1f} ms ({speedup:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
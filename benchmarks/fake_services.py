@@ -0,0 +1,209 @@
+"""
+Stand-ins for the OpenAI and Google Calendar clients with configurable latency.
+
+StubAsyncOpenAI answers like the model would for the synthetic timetables:
+every three lines of a multi-event cell are one event. FakeCalendarService
+keeps the events in memory and supports the calls the calendar module makes,
+including batch requests, paginated listings and incremental listings with
+sync tokens. It can reject a share of the write requests with rate-limit
+errors (403 or 429) and let sync tokens expire (410), and counts the requests
+by kind in request_counts.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def _parse_details(details):
+    # The synthetic cells are blocks of course, lecturer and room lines
+    lines = details.split(", ")
+    return [
+        {"course": course, "lecturer": [lecturer], "location": room, "details": ""}
+        for course, lecturer, room in zip(lines[0::3], lines[1::3], lines[2::3])
+    ]
+
+
+class StubAsyncOpenAI:
+    """Mimics AsyncOpenAI.chat.completions.create for the timetable prompt."""
+
+    def __init__(self, latency=0.3):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        content = json.dumps(_parse_details(messages[-1]["content"]))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+    async def close(self):
+        pass
+
+
+def _http_error(status, reason):
+    content = json.dumps({"error": {"code": status, "errors": [{"reason": reason}]}})
+    return HttpError(httplib2.Response({"status": status}), content.encode("utf-8"))
+
+
+class _FakeRequest:
+    def __init__(self, service, kind, operation):
+        self.service = service
+        self.kind = kind
+        self.operation = operation
+
+    def run(self):
+        """Apply the request without a round trip, as part of a batch."""
+        self.service.request_counts[self.kind] += 1
+        if self.kind in ("insert", "patch", "delete"):
+            self.service.maybe_rate_limit()
+        return self.operation()
+
+    def execute(self):
+        time.sleep(self.service.latency)
+        self.service.requests += 1
+        return self.run()
+
+
+class _FakeEvents:
+    def __init__(self, service):
+        self.service = service
+
+    def insert(self, calendarId, body):
+        def operation():
+            event = dict(body, id=f"event{next(self.service.ids)}")
+            self.service.store[event["id"]] = event
+            self.service.record_change(event["id"])
+            return event
+
+        return _FakeRequest(self.service, "insert", operation)
+
+    def patch(self, calendarId, eventId, body):
+        def operation():
+            self.service.store[eventId].update(body)
+            self.service.record_change(eventId)
+            return self.service.store[eventId]
+
+        return _FakeRequest(self.service, "patch", operation)
+
+    def delete(self, calendarId, eventId):
+        def operation():
+            event = self.service.store.pop(eventId)
+            self.service.record_change(eventId)
+            return event
+
+        return _FakeRequest(self.service, "delete", operation)
+
+    def list(self, maxResults=2500, pageToken=None, syncToken=None, **kwargs):
+        def operation():
+            if syncToken is None:
+                items = list(self.service.store.values())
+            else:
+                items = self.service.changes_since(syncToken)
+            offset = int(pageToken or 0)
+            page_size = min(maxResults, self.service.page_size or maxResults)
+            result = {"items": items[offset : offset + page_size]}
+            if offset + page_size < len(items):
+                result["nextPageToken"] = str(offset + page_size)
+            else:
+                result["nextSyncToken"] = str(self.service.version)
+            return result
+
+        kind = "list" if syncToken is None else "list_incremental"
+        return _FakeRequest(self.service, kind, operation)
+
+
+class _FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        # One round trip for the whole batch
+        time.sleep(self.service.latency)
+        self.service.requests += 1
+        self.service.request_counts["batch"] += 1
+        for request_id, request in self.requests:
+            try:
+                response = request.run()
+            except HttpError as e:
+                self.callback(request_id, None, e)
+            else:
+                self.callback(request_id, response, None)
+
+
+class FakeCalendarService:
+    """
+    In-memory Calendar API service: service.events().insert(...).execute().
+
+    page_size limits the events per list page below maxResults. A share of
+    rate_limit_ratio of the inserts, patches and deletes fails with
+    rate_limit_status (403 as rateLimitExceeded, or 429). With
+    expire_sync_tokens every incremental listing fails with 410 Gone.
+    """
+
+    def __init__(
+        self,
+        latency=0.05,
+        page_size=None,
+        rate_limit_ratio=0.0,
+        rate_limit_status=429,
+        expire_sync_tokens=False,
+        seed=42,
+    ):
+        self.latency = latency
+        self.page_size = page_size
+        self.rate_limit_ratio = rate_limit_ratio
+        self.rate_limit_status = rate_limit_status
+        self.expire_sync_tokens = expire_sync_tokens
+        self.random = random.Random(seed)
+        # Round trips; request_counts counts the operations (also in batches)
+        self.requests = 0
+        self.request_counts = Counter()
+        self.store = {}
+        self.ids = itertools.count()
+        # Event ids by the version of the calendar they were changed in
+        self.version = 0
+        self.changes = []
+
+    def events(self):
+        return _FakeEvents(self)
+
+    def new_batch_http_request(self, callback):
+        return _FakeBatch(self, callback)
+
+    def maybe_rate_limit(self):
+        if self.random.random() < self.rate_limit_ratio:
+            self.request_counts["rate_limited"] += 1
+            reason = "rateLimitExceeded" if self.rate_limit_status == 403 else ""
+            raise _http_error(self.rate_limit_status, reason)
+
+    def record_change(self, event_id):
+        self.version += 1
+        self.changes.append((self.version, event_id))
+
+    def changes_since(self, sync_token):
+        if self.expire_sync_tokens:
+            self.request_counts["sync_token_expired"] += 1
+            raise _http_error(410, "fullSyncRequired")
+        changed_ids = dict.fromkeys(
+            event_id for version, event_id in self.changes if version > int(sync_token)
+        )
+        return [
+            self.store.get(event_id, {"id": event_id, "status": "cancelled"})
+            for event_id in changed_ids
+        ]
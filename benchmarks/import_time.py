@@ -0,0 +1,76 @@
+"""
+Check that the CLI starts without loading the heavy dependencies.
+
+Imports timetable_scraper.cli and builds its argument parser in fresh
+interpreters, reports the best wall time and fails if it exceeds the budget or
+if any of the heavy modules ended up in sys.modules:
+
+    PYTHONPATH=src python benchmarks/import_time.py --budget 0.3
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = (
+    "pandas",
+    "camelot",
+    "cv2",
+    "fitz",
+    "openai",
+    "googleapiclient",
+    "webdav3",
+    "pyarrow",
+)
+# Measured inside the child, so the interpreter startup itself is not counted
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import timetable_scraper.cli
+timetable_scraper.cli.build_parser()
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_import(repeats=5):
+    """Return the best import time in seconds and the heavy modules loaded."""
+    timings = []
+    heavy = set()
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output)
+        timings.append(result["seconds"])
+        heavy.update(result["heavy"])
+    return min(timings), sorted(heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--budget", type=float, default=0.3, help="Maximum import time in seconds."
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    seconds, heavy = measure_import(args.repeats)
+    print(f"timetable_scraper.cli: {seconds * 1000:.1f} ms (budget {args.budget * 1000:.0f} ms)")
+    failed = False
+    if heavy:
+        print(f"Heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if seconds > args.budget:
+        print("Import time over budget.")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Benchmark the pipeline end to end on a synthetic timetable.
+
+The PDF is generated with synthetic_timetable.py and run through
+create_df_from_pdf -> process_data -> create_all_events, with a stubbed OpenAI
+client and an in-memory Calendar service that add a fixed latency per request.
+The "pipelined" stage runs parsing and sync again through
+run_calendar_pipeline (in a fresh working directory, so nothing is cached),
+which overlaps them; compare it with parse + sync. The "resync" stage syncs
+the same events twice with sync_events against the filled calendar: once with
+a full (paginated) listing and once incrementally with the sync token.
+The Calendar service can page its listings, rate-limit writes and expire sync
+tokens; the requests are reported by kind.
+Each run starts in an empty working directory, so no cache or lecturer index
+carries over between runs or from the repository.
+
+Stage timings (best and median of --repeats runs) are measured without
+tracing; peak memory per stage comes from one additional run under
+tracemalloc. The results are written as JSON and can be compared:
+
+    python benchmarks/run_pipeline.py --weeks 30 --multi-event-ratio 0.2
+    python benchmarks/run_pipeline.py --compare benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Keep the pipeline's INFO logging out of the measurements
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_FILE", os.devnull)
+
+from fake_services import FakeCalendarService, StubAsyncOpenAI  # noqa: E402
+from synthetic_timetable import generate_timetable_pdf  # noqa: E402
+from timetable_scraper.libs.camelot_raw_pdf_to_df import (  # noqa: E402
+    create_df_from_pdf,
+)
+from timetable_scraper.libs.metrics import metrics  # noqa: E402
+from timetable_scraper.libs.process_raw_data import process_data  # noqa: E402
+from timetable_scraper.libs.table_backends import PYMUPDF, TABLE_BACKENDS  # noqa: E402
+from timetable_scraper.libs.timetable_event import events_from_df  # noqa: E402
+from timetable_scraper.libs.timetable_pipeline import (  # noqa: E402
+    run_calendar_pipeline,
+)
+from timetable_scraper.libs.update_timetable_google_api import (  # noqa: E402
+    GoogleCalendarAPI,
+    create_all_events,
+    sync_events,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STAGES = ("extract", "parse", "sync", "resync", "pipelined")
+
+
+def _measure(function, trace_memory):
+    """Run function and return (result, seconds or peak bytes)."""
+    if trace_memory:
+        tracemalloc.start()
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, peak
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def _calendar_service(args):
+    return FakeCalendarService(
+        latency=args.calendar_latency,
+        page_size=args.calendar_page_size,
+        rate_limit_ratio=args.rate_limit_ratio,
+        rate_limit_status=args.rate_limit_status,
+        expire_sync_tokens=args.expire_sync_tokens,
+    )
+
+
+def _resync(calendar_api, events_df, batch):
+    """Full sync against the filled calendar, then an incremental one."""
+    return [
+        sync_events(calendar_api, events_from_df(events_df), batch=batch)
+        for _ in range(2)
+    ]
+
+
+def run_once(pdf_path, args, trace_memory=False):
+    """One pass through the pipeline in a fresh working directory."""
+    cwd = os.getcwd()
+    measurements = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.makedirs("output")
+        try:
+            metrics.reset()
+            timetable_df, measurements["extract"] = _measure(
+                lambda: create_df_from_pdf(
+                    pdf_path, use_cache=False, backend=args.backend
+                ),
+                trace_memory,
+            )
+            openai_client = StubAsyncOpenAI(latency=args.openai_latency)
+            events_df, measurements["parse"] = _measure(
+                lambda: process_data(
+                    timetable_df,
+                    "benchmark",
+                    max_concurrency=args.openai_concurrency,
+                    openai_client=openai_client,
+                ),
+                trace_memory,
+            )
+            service = _calendar_service(args)
+            calendar_api = GoogleCalendarAPI(
+                "benchmark", "Europe/Berlin", service=service
+            )
+            created_events, measurements["sync"] = _measure(
+                lambda: create_all_events(
+                    calendar_api, events_from_df(events_df), batch=args.batch
+                ),
+                trace_memory,
+            )
+            sync_counts, measurements["resync"] = _measure(
+                lambda: _resync(calendar_api, events_df, args.batch), trace_memory
+            )
+        finally:
+            os.chdir(cwd)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            pipeline_client = StubAsyncOpenAI(latency=args.openai_latency)
+            pipeline_api = GoogleCalendarAPI(
+                "benchmark",
+                "Europe/Berlin",
+                service=_calendar_service(args),
+            )
+            _, measurements["pipelined"] = _measure(
+                lambda: run_calendar_pipeline(
+                    [(pdf_path, timetable_df)],
+                    "benchmark",
+                    lambda events: create_all_events(
+                        pipeline_api, events, batch=args.batch
+                    ),
+                    max_concurrency=args.openai_concurrency,
+                    openai_client=pipeline_client,
+                ),
+                trace_memory,
+            )
+        finally:
+            os.chdir(cwd)
+    counts = {
+        "timetable_rows": len(timetable_df),
+        "multi_event_rows": int(timetable_df["multi_event"].sum()),
+        "events": len(events_df),
+        "created_events": len(created_events),
+        "openai_requests": openai_client.calls,
+        "calendar_requests": service.requests,
+        "calendar_request_counts": dict(sorted(service.request_counts.items())),
+        "resync": sync_counts,
+    }
+    return measurements, counts, metrics.snapshot()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        pdf_path = os.path.join(pdf_dir, "synthetic_timetable.pdf")
+        pdf_info = generate_timetable_pdf(
+            pdf_path,
+            weeks=args.weeks,
+            time_slots=args.time_slots,
+            multi_event_ratio=args.multi_event_ratio,
+            fill_ratio=args.fill_ratio,
+            guest_ratio=args.guest_ratio,
+            seed=args.seed,
+        )
+        timings = {stage: [] for stage in STAGES}
+        for _ in range(args.repeats):
+            measurements, counts, stage_metrics = run_once(pdf_path, args)
+            for stage in STAGES:
+                timings[stage].append(measurements[stage])
+        peak_memory, _, _ = run_once(pdf_path, args, trace_memory=True)
+
+    stages = {
+        stage: {
+            "best_seconds": min(timings[stage]),
+            "median_seconds": statistics.median(timings[stage]),
+            "runs_seconds": timings[stage],
+            "peak_memory_bytes": peak_memory[stage],
+        }
+        for stage in STAGES
+    }
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "compare")
+        },
+        "pdf": pdf_info,
+        "counts": counts,
+        "stages": stages,
+        "total_best_seconds": sum(
+            stages[stage]["best_seconds"] for stage in ("extract", "parse", "sync")
+        ),
+        "metrics": stage_metrics,
+    }
+
+
+def print_results(results, baseline=None):
+    print(
+        f"{results['pdf']['pages']} pages, {results['counts']['timetable_rows']} rows, "
+        f"{results['counts']['events']} events, "
+        f"{results['counts']['openai_requests']} OpenAI and "
+        f"{results['counts']['calendar_requests']} Calendar requests"
+    )
+    request_counts = results["counts"].get("calendar_request_counts", {})
+    print(
+        "Calendar requests by kind: "
+        + ", ".join(f"{kind} {count}" for kind, count in request_counts.items())
+    )
+    header = f"{'stage':<10}{'best s':>10}{'median s':>10}{'peak MiB':>10}"
+    if baseline:
+        header += f"{'base s':>10}{'change':>10}"
+        if baseline["parameters"] != results["parameters"]:
+            print("Note: the baseline was run with different parameters.")
+    print(header)
+    for stage, values in results["stages"].items():
+        line = (
+            f"{stage:<10}{values['best_seconds']:>10.3f}"
+            f"{values['median_seconds']:>10.3f}"
+            f"{values['peak_memory_bytes'] / 2**20:>10.1f}"
+        )
+        if baseline and stage in baseline["stages"]:
+            before = baseline["stages"][stage]["best_seconds"]
+            change = (values["best_seconds"] - before) / before if before else 0.0
+            line += f"{before:>10.3f}{change:>+10.1%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--weeks", type=int, default=15)
+    parser.add_argument("--time-slots", type=int, default=6, choices=range(1, 8))
+    parser.add_argument("--multi-event-ratio", type=float, default=0.15)
+    parser.add_argument("--fill-ratio", type=float, default=0.6)
+    parser.add_argument(
+        "--guest-ratio",
+        type=float,
+        default=0.5,
+        help="Share of multi-event cells the rule-based parser cannot split.",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=sorted(TABLE_BACKENDS), default=PYMUPDF)
+    parser.add_argument(
+        "--openai-latency", type=float, default=0.3, help="Seconds per OpenAI request."
+    )
+    parser.add_argument("--openai-concurrency", type=int, default=8)
+    parser.add_argument(
+        "--calendar-latency",
+        type=float,
+        default=0.02,
+        help="Seconds per Calendar API request or batch.",
+    )
+    parser.add_argument(
+        "--calendar-page-size",
+        type=int,
+        help="Events per Calendar list page (default: maxResults).",
+    )
+    parser.add_argument(
+        "--rate-limit-ratio",
+        type=float,
+        default=0.0,
+        help="Share of Calendar writes rejected as rate-limited (needs --batch).",
+    )
+    parser.add_argument("--rate-limit-status", type=int, default=429, choices=(403, 429))
+    parser.add_argument(
+        "--expire-sync-tokens",
+        action="store_true",
+        help="Answer incremental listings with 410 Gone.",
+    )
+    parser.add_argument(
+        "--batch", action="store_true", help="Insert the events with batch requests."
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results).")
+    parser.add_argument("--compare", help="Earlier results file to compare against.")
+    args = parser.parse_args()
+    if args.rate_limit_ratio and not args.batch:
+        # Only batch requests retry rate-limited operations
+        parser.error("--rate-limit-ratio requires --batch")
+
+    results = run_benchmark(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"{datetime.now():%Y%m%dT%H%M%S}_{results['commit'] or 'nocommit'}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
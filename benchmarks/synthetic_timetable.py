@@ -0,0 +1,177 @@
+"""
+Generate lattice-style timetable PDFs shaped like the HSBI timetables.
+
+Every page holds one ruled table with a header row ("", "Datum", time slots)
+and one row per weekday. Cells contain course, lecturer and room on separate
+lines; multi-event cells stack several of those blocks. Some multi-event cells
+name guest lecturers that never teach a single event, so the rule-based parser
+cannot learn them and hands those cells to the (stubbed) OpenAI parser. The
+first page carries the "Version:" stamp the pipeline reads the year from.
+
+    python benchmarks/synthetic_timetable.py out.pdf --weeks 30 --multi-event-ratio 0.2
+"""
+
+import argparse
+import random
+from datetime import date, timedelta
+
+import fitz  # PyMuPDF
+
+GERMAN_MONTHS = [
+    "Jan", "Feb", "Mär", "Apr", "Mai", "Jun",
+    "Jul", "Aug", "Sep", "Okt", "Nov", "Dez",
+]  # fmt: skip
+WEEKDAYS = ["Mo", "Di", "Mi", "Do", "Fr"]
+TIME_SLOTS = [
+    "08.00 - 09.30 Uhr",
+    "09.45 - 11.15 Uhr",
+    "11.30 - 13.00 Uhr",
+    "14.00 - 15.30 Uhr",
+    "15.45 - 17.15 Uhr",
+    "17.30 - 19.00 Uhr",
+    "19.15 - 20.45 Uhr",
+]
+COURSES = [
+    "Mathematik 2", "Elektrotechnik 2", "Programmieren", "Physik",
+    "Regelungstechnik", "Digitaltechnik", "Technisches Englisch", "Messtechnik",
+    "Werkstoffkunde", "Leistungselektronik", "Signale und Systeme", "Informatik",
+]  # fmt: skip
+LECTURERS = [
+    "Prof. Dr. Müller", "Prof. Dr. Schmidt", "Dr. Weber", "Prof. Dr. Fischer",
+    "Prof. Dr. Wagner", "Dr. Becker", "Prof. Dr. Hoffmann", "Schulz",
+]  # fmt: skip
+# Only appear in multi-event cells
+GUEST_LECTURERS = ["Kowalski", "Dr. Okafor", "Lindqvist", "Dr. Haddad"]
+ROOMS = ["D 101", "D 202", "C 014", "E 110", "A 305", "Online"]
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595  # A4 landscape
+MARGIN = 30
+ROW_HEIGHT = 72
+FONT_SIZE = 5
+
+
+def _event_block(rng, lecturers=LECTURERS):
+    return [rng.choice(COURSES), rng.choice(lecturers), rng.choice(ROOMS)]
+
+
+def timetable_rows(
+    weeks, time_slots, multi_event_ratio, fill_ratio, guest_ratio, seed
+):
+    """Rows of cell texts (weekday, date label, one cell per time slot)."""
+    rng = random.Random(seed)
+    start = date(2024, 3, 18)
+    rows = []
+    for week in range(weeks):
+        for weekday, name in enumerate(WEEKDAYS):
+            day = start + timedelta(weeks=week, days=weekday)
+            cells = [name, f"{day.day:02d}. {GERMAN_MONTHS[day.month - 1]}"]
+            for _ in range(time_slots):
+                if rng.random() >= fill_ratio:
+                    cells.append("")
+                elif rng.random() < multi_event_ratio:
+                    blocks = rng.randint(2, 3)
+                    guest = rng.random() < guest_ratio
+                    lecturers = GUEST_LECTURERS if guest else LECTURERS
+                    lines = [
+                        line
+                        for _ in range(blocks)
+                        for line in _event_block(rng, lecturers)
+                    ]
+                    cells.append("\n".join(lines))
+                else:
+                    cells.append("\n".join(_event_block(rng)))
+            rows.append(cells)
+    return rows
+
+
+def _draw_table(page, header, rows):
+    columns = len(header)
+    first_widths = [30, 50]
+    slot_width = (PAGE_WIDTH - 2 * MARGIN - sum(first_widths)) / (columns - 2)
+    widths = first_widths + [slot_width] * (columns - 2)
+    xs = [MARGIN]
+    for width in widths:
+        xs.append(xs[-1] + width)
+    ys = [MARGIN + i * ROW_HEIGHT for i in range(len(rows) + 2)]
+
+    shape = page.new_shape()
+    for x in xs:
+        shape.draw_line((x, ys[0]), (x, ys[-1]))
+    for y in ys:
+        shape.draw_line((xs[0], y), (xs[-1], y))
+    shape.finish(color=(0, 0, 0), width=0.5)
+    shape.commit()
+
+    for row_index, cells in enumerate([header] + rows):
+        for column, text in enumerate(cells):
+            if text:
+                rect = fitz.Rect(
+                    xs[column] + 2, ys[row_index] + 2,
+                    xs[column + 1] - 2, ys[row_index + 1] - 2,
+                )  # fmt: skip
+                if page.insert_textbox(rect, text, fontsize=FONT_SIZE) < 0:
+                    raise ValueError(f"Cell text does not fit: {text!r}")
+
+
+def generate_timetable_pdf(
+    path,
+    weeks=15,
+    time_slots=6,
+    multi_event_ratio=0.15,
+    fill_ratio=0.6,
+    guest_ratio=0.5,
+    seed=42,
+    version="17.04.2024, 10:01",
+):
+    """
+    Write a synthetic timetable PDF to path.
+
+    Returns:
+    dict: The number of pages, table rows and non-empty cells.
+    """
+    header = ["", "Datum"] + TIME_SLOTS[:time_slots]
+    rows = timetable_rows(
+        weeks, time_slots, multi_event_ratio, fill_ratio, guest_ratio, seed
+    )
+    rows_per_page = int((PAGE_HEIGHT - 2 * MARGIN) // ROW_HEIGHT) - 1
+
+    document = fitz.open()
+    for first_row in range(0, len(rows), rows_per_page):
+        page = document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        if first_row == 0:
+            page.insert_text(
+                (MARGIN, MARGIN - 10), f"Version: {version} Uhr", fontsize=8
+            )
+        _draw_table(page, header, rows[first_row : first_row + rows_per_page])
+    page_count = document.page_count
+    document.save(path)
+    document.close()
+    cells = sum(1 for row in rows for cell in row[2:] if cell)
+    return {"pages": page_count, "rows": len(rows), "cells": cells}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic timetable PDF.")
+    parser.add_argument("path")
+    parser.add_argument("--weeks", type=int, default=15)
+    parser.add_argument("--time-slots", type=int, default=6, choices=range(1, 8))
+    parser.add_argument("--multi-event-ratio", type=float, default=0.15)
+    parser.add_argument("--fill-ratio", type=float, default=0.6)
+    parser.add_argument("--guest-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(
+        generate_timetable_pdf(
+            args.path,
+            weeks=args.weeks,
+            time_slots=args.time_slots,
+            multi_event_ratio=args.multi_event_ratio,
+            fill_ratio=args.fill_ratio,
+            guest_ratio=args.guest_ratio,
+            seed=args.seed,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+import argparse
+import logging
+import os
+import sys
+
+from timetable_scraper.libs.helper_functions import load_secrets
+from timetable_scraper.libs.log_config import setup_logger
+from timetable_scraper.libs.metrics import METRICS_FILE, metrics
+from timetable_scraper.libs.table_backends import DEFAULT_BACKEND, TABLE_BACKENDS
+
+logger = logging.getLogger(__name__)
+
+# Only light modules are imported above. pandas, Camelot, PyMuPDF, OpenAI, the
+# Google client and the WebDAV client are imported by the subcommands that use
+# them, so `--help`, `versions` or `download` start without loading them.
+
+SECRETS_FILE = "config/secrets.yaml"
+PDF_PATH = "downloads/Stundenplan SoSe_2024_ELM 2.pdf"
+TIMETABLE_FILE = "output/timetable.parquet"
+EVENTS_FILE = "output/final_events.jsonl"
+
+########################################################################################
+#                                   SHARED SETTINGS                                    #
+########################################################################################
+
+
+class CommandError(Exception):
+    """A subcommand cannot run, e.g. because of missing settings."""
+
+
+def _load_secrets(args):
+    try:
+        secrets = load_secrets(args.secrets)
+    except OSError as e:
+        raise CommandError(f"Failed to load secrets from {args.secrets}: {e}")
+    if not secrets:
+        raise CommandError("Failed to load secrets.")
+    return secrets
+
+
+def _require_api_key(secrets):
+    api_key = secrets.get("api_key")
+    if not api_key:
+        raise CommandError("API key not found in secrets.")
+    return api_key
+
+
+def _backend(args, secrets):
+    return args.backend or secrets.get("extraction_backend", DEFAULT_BACKEND)
+
+
+def _report_metrics(secrets):
+    metrics.report(secrets.get("metrics_file", METRICS_FILE))
+
+
+########################################################################################
+#                                     SUBCOMMANDS                                      #
+########################################################################################
+
+
+def download_command(args):
+    from timetable_scraper.libs.download_timetables import sync_timetables
+
+    secrets = _load_secrets(args)
+    changed_pdfs = sync_timetables(config=secrets, max_workers=args.workers)
+    _report_metrics(secrets)
+    if changed_pdfs is None:
+        raise CommandError("Failed to download the timetables.")
+    for pdf_path in changed_pdfs:
+        print(pdf_path)
+    return 0
+
+
+def extract_command(args):
+    from timetable_scraper.libs.camelot_raw_pdf_to_df import create_df_from_pdf
+    from timetable_scraper.libs.timetable_cache import write_timetable_df
+
+    secrets = _load_secrets(args)
+    timetable_df = create_df_from_pdf(
+        args.pdf,
+        use_cache=not args.no_cache,
+        extract_workers=args.extract_workers,
+        backend=_backend(args, secrets),
+    )
+    write_timetable_df(timetable_df, args.output)
+    logger.info(f"Wrote {len(timetable_df)} timetable rows to {args.output}")
+    _report_metrics(secrets)
+    return 0
+
+
+def parse_command(args):
+    from timetable_scraper.libs.process_raw_data import iter_events
+    from timetable_scraper.libs.timetable_cache import read_timetable_df
+    from timetable_scraper.libs.timetable_event import save_events
+
+    secrets = _load_secrets(args)
+    api_key = _require_api_key(secrets)
+    timetable_df = read_timetable_df(args.timetable)
+    save_events(iter_events(timetable_df, api_key), args.output)
+    _report_metrics(secrets)
+    return 0
+
+
+def sync_command(args):
+    from timetable_scraper.libs.update_timetable_google_api import main as sync_file
+
+    secrets = _load_secrets(args)
+    calendar_id = args.calendar_id or secrets.get("calendar_id")
+    if not calendar_id:
+        raise CommandError("No calendar id given and none found in secrets.")
+    dry_run = secrets.get("dry_run", True) if args.dry_run is None else args.dry_run
+    result = sync_file(
+        dry_run=dry_run,
+        events_file=args.events,
+        calendar_id=calendar_id,
+        time_zone=secrets.get("time_zone", "Europe/Berlin"),
+    )
+    _report_metrics(secrets)
+    return 1 if result is None else 0
+
+
+def versions_command(args):
+    from timetable_scraper.libs.get_timetable_ver import (
+        VERSION_LOG_FILE,
+        append_version_log,
+        extract_version,
+    )
+
+    pdf_paths = args.pdfs or sorted(
+        os.path.join(args.downloads, name)
+        for name in os.listdir(args.downloads)
+        if name.lower().endswith(".pdf")
+    )
+    versions = []
+    for pdf_path in pdf_paths:
+        version = extract_version(pdf_path)
+        print(f"{os.path.basename(pdf_path)}\t{version or 'unknown'}")
+        if version:
+            versions.append((os.path.basename(pdf_path), version))
+    if args.log:
+        append_version_log(args.version_log or VERSION_LOG_FILE, versions)
+    return 0 if len(versions) == len(pdf_paths) else 1
+
+
+def run_command(args):
+    from timetable_scraper.libs.timetable_cache import purge_cache
+    from timetable_scraper.libs.timetable_runner import (
+        resolve_timetable_jobs,
+        run_timetables,
+        select_changed_jobs,
+    )
+
+    logger.info("Starting the main process.")
+    if args.purge_cache:
+        purge_cache()
+
+    secrets = _load_secrets(args)
+    api_key = _require_api_key(secrets)
+    time_zone = secrets.get("time_zone", "Europe/Berlin")
+
+    # Map each timetable PDF to its calendar, falling back to the single PDF
+    default_jobs = [{"pdf": PDF_PATH, "calendar_id": secrets.get("calendar_id")}]
+    run_options = {
+        "dry_run": secrets.get("dry_run", True),
+        "use_cache": not args.no_cache,
+        "max_processes": args.processes,
+        "max_threads": args.threads,
+        "extract_workers": args.extract_workers,
+        "backend": _backend(args, secrets),
+    }
+    metrics_file = secrets.get("metrics_file", METRICS_FILE)
+    if args.watch:
+        from timetable_scraper.libs.timetable_watcher import (
+            POLL_INTERVAL_SECONDS,
+            watch_timetables,
+        )
+
+        watch_timetables(
+            secrets,
+            interval=args.interval or POLL_INTERVAL_SECONDS,
+            metrics_file=metrics_file,
+            default_jobs=default_jobs,
+            **run_options,
+        )
+        return 0
+
+    changed_pdfs = None
+    if args.download:
+        from timetable_scraper.libs.download_timetables import sync_timetables
+
+        changed_pdfs = sync_timetables(config=secrets)
+        if changed_pdfs is None:
+            raise CommandError("Failed to download the timetables.")
+
+    jobs = resolve_timetable_jobs(secrets.get("timetables")) or default_jobs
+    if changed_pdfs is not None:
+        jobs = select_changed_jobs(jobs, changed_pdfs)
+        if not jobs:
+            logger.info("No timetable changed, nothing to do.")
+            metrics.report(metrics_file)
+            return 0
+    logger.info(f"Processing {len(jobs)} PDF timetable(s).")
+    summaries = run_timetables(jobs, api_key, time_zone, **run_options)
+    metrics.report(metrics_file)
+    if any(summary["status"] != "ok" for summary in summaries):
+        logger.error("Some timetables failed, see the summary above.")
+        return 1
+    logger.info("All timetables synchronized with Google Calendar.")
+    return 0
+
+
+########################################################################################
+#                                   ARGUMENT PARSER                                    #
+########################################################################################
+
+
+def _add_extraction_options(parser):
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the timetable cache and always extract the tables from the PDF.",
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=1,
+        help="Number of processes extracting the pages of a single PDF.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=sorted(TABLE_BACKENDS),
+        default=None,
+        help="Table extraction backend (default: 'extraction_backend' from the "
+        f"secrets or {DEFAULT_BACKEND}).",
+    )
+
+
+def _add_run_options(parser):
+    _add_extraction_options(parser)
+    parser.add_argument(
+        "--purge-cache",
+        action="store_true",
+        help="Delete all cached timetables before running.",
+    )
+    parser.add_argument(
+        "--download",
+        action="store_true",
+        help="Download changed PDFs first and only process the calendars they affect.",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of processes extracting PDFs (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Number of threads parsing and syncing calendars.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="Seconds between two polls in watch mode (default: 15 minutes, "
+        "randomized by +/-10%%).",
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="timetable-scraper", description="Scrape the HSBI timetable."
+    )
+    parser.add_argument(
+        "--secrets",
+        default=SECRETS_FILE,
+        help=f"Secrets and settings file (default: {SECRETS_FILE}).",
+    )
+    parser.add_argument(
+        "--log-level",
+        type=str.upper,
+        default=None,
+        help="Root log level (default: LOG_LEVEL from the environment or INFO).",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    download = subparsers.add_parser(
+        "download", help="Download new and changed timetable PDFs."
+    )
+    download.add_argument(
+        "--workers", type=int, default=4, help="Number of parallel downloads."
+    )
+    download.set_defaults(handler=download_command)
+
+    extract = subparsers.add_parser(
+        "extract", help="Extract the timetable table of a PDF into a Parquet file."
+    )
+    extract.add_argument("pdf", nargs="?", default=PDF_PATH)
+    extract.add_argument("-o", "--output", default=TIMETABLE_FILE)
+    _add_extraction_options(extract)
+    extract.set_defaults(handler=extract_command)
+
+    parse = subparsers.add_parser(
+        "parse", help="Parse an extracted timetable into events (JSON Lines)."
+    )
+    parse.add_argument("timetable", nargs="?", default=TIMETABLE_FILE)
+    parse.add_argument(
+        "-o",
+        "--output",
+        default=EVENTS_FILE,
+        help="Events file; a .ttev suffix writes the compact binary format.",
+    )
+    parse.set_defaults(handler=parse_command)
+
+    sync = subparsers.add_parser(
+        "sync", help="Sync the events of a JSON Lines file with Google Calendar."
+    )
+    sync.add_argument("events", nargs="?", default=EVENTS_FILE)
+    sync.add_argument(
+        "--calendar-id", help="Target calendar (default: 'calendar_id' from secrets)."
+    )
+    sync.add_argument(
+        "--dry-run",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Only write the prepared events to a CSV file (default: 'dry_run' "
+        "from secrets).",
+    )
+    sync.set_defaults(handler=sync_command)
+
+    versions = subparsers.add_parser(
+        "versions", help="Print the 'Version:' stamp of the timetable PDFs."
+    )
+    versions.add_argument("pdfs", nargs="*", help="PDFs (default: all in --downloads).")
+    versions.add_argument("--downloads", default="downloads")
+    versions.add_argument(
+        "--log", action="store_true", help="Append the versions to the version log."
+    )
+    versions.add_argument("--version-log", default=None)
+    versions.set_defaults(handler=versions_command)
+
+    run = subparsers.add_parser(
+        "run", help="Extract, parse and sync all configured timetables."
+    )
+    _add_run_options(run)
+    run.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and process timetables whenever a new version is published.",
+    )
+    run.set_defaults(handler=run_command)
+
+    watch = subparsers.add_parser(
+        "watch", help="Same as 'run --watch': poll for new timetable versions."
+    )
+    _add_run_options(watch)
+    watch.set_defaults(handler=run_command, watch=True)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logger(level=args.log_level)
+    try:
+        return args.handler(args)
+    except CommandError as e:
+        logger.error(str(e))
+        return 1
+    except Exception as e:
+        logger.exception(f"An error occurred during '{args.command}': {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,70 @@
 import logging
-import os
+from datetime import time
 
-import camelot
+import numpy as np
 import pandas as pd
 from timetable_scraper.libs.get_timetable_ver import extract_version
 from timetable_scraper.libs.helper_functions import save_to_csv
-# Set up the logger
+from timetable_scraper.libs.metrics import span, timed
+from timetable_scraper.libs.table_backends import DEFAULT_BACKEND, get_table_backend
+from timetable_scraper.libs.timetable_document import TimetableDocument
+from timetable_scraper.libs.timetable_schema import (
+    apply_timetable_schema,
+    is_multi_event,
+)
+from timetable_scraper.libs.timetable_cache import (
+    build_cache_key,
+    load_cached_df,
+    store_cached_df,
+)
 from timetable_scraper.libs.log_config import setup_logger
-setup_logger()
-logger = logging.getLogger(__name__)
 
-########################################################################################
-#                      SET ENVIRONMENT VARIABLES FOR GHOSTSCRIPT                       #
-########################################################################################
+logger = logging.getLogger(__name__)
 
-os.environ["PATH"] = "/opt/homebrew/bin" + os.pathsep + os.environ["PATH"]
-os.environ["DYLD_LIBRARY_PATH"] = "/opt/homebrew/lib"
+# German month abbreviations of the date labels (English ones are accepted too)
+MONTH_NUMBERS = {
+    "Jan": 1,
+    "Feb": 2,
+    "Mär": 3,
+    "Mrz": 3,
+    "Mar": 3,
+    "Apr": 4,
+    "Mai": 5,
+    "May": 5,
+    "Jun": 6,
+    "Jul": 7,
+    "Aug": 8,
+    "Sep": 9,
+    "Okt": 10,
+    "Oct": 10,
+    "Nov": 11,
+    "Dez": 12,
+    "Dec": 12,
+}
 
 ########################################################################################
 #                                GET RAW DATA FROM PDF                                 #
 ########################################################################################
 
 
-def extract_tables(pdf_path):
-    try:
-        logging.info(f"Starting to extract tables from: {pdf_path}")
-        table_list = camelot.read_pdf(pdf_path, flavor="lattice", pages="all")
-        logging.info(f"Successfully extracted {len(table_list)} tables.")
-        return table_list
-    except Exception as e:
-        logging.error(f"Failed to extract tables: {e}")
-        return None
+def extract_tables(document, workers=1, backend=DEFAULT_BACKEND):
+    """Extract the tables of a TimetableDocument (or a PDF path) with the backend."""
+    is_document = isinstance(document, TimetableDocument)
+    pdf_path = document.pdf_path if is_document else document
+    with span("extract_tables") as stage:
+        try:
+            logger.info(f"Starting to extract tables from: {pdf_path} ({backend})")
+            if is_document:
+                stage.add_bytes(len(document.content))
+                table_list = document.tables(backend, workers=workers)
+            else:
+                table_list = get_table_backend(backend)(pdf_path, workers=workers)
+            logger.info(f"Successfully extracted {len(table_list)} tables.")
+            return table_list
+        except Exception as e:
+            logger.error(f"Failed to extract tables: {e}")
+            stage.error = True
+            return None
 
 
 ########################################################################################
@@ -65,8 +99,27 @@ def convert_tablelist_to_dataframe(df_tables):
 
 
 def melt_df(df):
-    df = df.melt(id_vars=["date"], var_name="time_slot", value_name="raw_details")
-    return df
+    """
+    Melt the timetable to one row per date and time slot.
+
+    Equivalent to df.melt(id_vars=["date"], ...), but the time slot headers
+    are not repeated as strings: time_slot is a categorical whose codes are
+    broadcast from the column positions, and date is tiled from the (already
+    parsed) date column.
+    """
+    # Selected by position: merged header cells can repeat a label (e.g. "")
+    is_value_column = df.columns != "date"
+    values = df.iloc[:, is_value_column].to_numpy()
+    slot_codes, time_slots = pd.factorize(df.columns[is_value_column].to_numpy())
+    return pd.DataFrame(
+        {
+            "date": np.tile(df["date"].to_numpy(), values.shape[1]),
+            "time_slot": pd.Categorical.from_codes(
+                np.repeat(slot_codes, len(df)), categories=time_slots
+            ),
+            "raw_details": values.ravel(order="F"),
+        }
+    )
 
 
 ########################################################################################
@@ -86,43 +139,48 @@ def get_year(pdf_path):
 ########################################################################################
 
 
+def parse_date_label(label, year):
+    """
+    Parse a date label of the timetable such as "18. Mär" (or "18.03.").
+
+    Returns:
+    pd.Timestamp: The date in the given year, NaT if it cannot be parsed.
+    """
+    if year is None or not isinstance(label, str):
+        return pd.NaT
+    day, _, month = label.partition(".")
+    month = month.strip().rstrip(".")
+    month_number = int(month) if month.isdigit() else MONTH_NUMBERS.get(month[:3])
+    try:
+        return pd.Timestamp(int(year), month_number, int(day))
+    except (TypeError, ValueError):
+        return pd.NaT
+
+
+@timed()
 def format_date(df, current_year):
-    # Define a mapping from German month abbreviations to English
-    month_mapping = {
-        "Jan": "Jan",
-        "Feb": "Feb",
-        "Mär": "Mar",
-        "Apr": "Apr",
-        "Mai": "May",
-        "Jun": "Jun",
-        "Jul": "Jul",
-        "Aug": "Aug",
-        "Sep": "Sep",
-        "Okt": "Oct",
-        "Nov": "Nov",
-        "Dez": "Dec",
-    }
-    current_year_str = str(current_year)
-    logging.info(f"Starting to format dates with the year: {current_year_str}")
-
-    # Replace German month abbreviations with English
-    df["date"] = df["date"].replace(month_mapping, regex=True)
-
-    # Convert 'date' column to datetime format
-    df["date"] = pd.to_datetime(
-        df["date"].astype(str) + " " + current_year_str,
-        format="%d. %b %Y",
-        errors="coerce",  # Convert errors to NaT
+    """
+    Replace the date labels with datetimes in current_year.
+
+    Each distinct label is parsed once and the result is broadcast to the rows
+    through the factorized codes, so this can run on the timetable before the
+    melt (one row per day) as well as after it.
+    """
+    logger.info(f"Starting to format dates with the year: {current_year}")
+    codes, labels = pd.factorize(df["date"])
+    # A trailing NaT for the code -1 of missing labels
+    dates = pd.DatetimeIndex(
+        [parse_date_label(label, current_year) for label in labels] + [pd.NaT]
     )
+    df["date"] = dates.to_numpy()[codes]
 
-    # Check and log any entries that failed to convert
-    if df["date"].isna().any():
-        failed_dates = df[df["date"].isna()]["date"]
-        logging.warning(
-            f"Some dates were not parsed correctly and have been set to NaT. Check these entries: {failed_dates.to_list()}"
+    failed_labels = [label for label, date in zip(labels, dates) if pd.isna(date)]
+    if failed_labels:
+        logger.warning(
+            f"Some dates were not parsed correctly and have been set to NaT. Check these entries: {failed_labels}"
         )
 
-    logging.info("Dates formatted successfully.")
+    logger.info("Dates formatted successfully.")
     # save_to_csv(df, "output/format_date.csv")
     return df
 
@@ -132,64 +190,68 @@ def format_date(df, current_year):
 ########################################################################################
 
 
+def _parse_clock(value):
+    hours, _, minutes = value.strip().replace(":", ".").partition(".")
+    return time(int(hours), int(minutes))
+
+
+def parse_time_slot(header):
+    """
+    Parse a time slot header such as "08.00 - 09.30 Uhr".
+
+    Returns:
+    tuple: (start time, end time), or None if the header is not a time slot.
+    """
+    start, _, end = str(header).replace("Uhr", "").partition("-")
+    try:
+        return _parse_clock(start), _parse_clock(end)
+    except ValueError:
+        return None
+
+
+@timed()
 def split_time_slot(df):
-    if "time_slot" in df.columns:
-        logging.info(
-            "Splitting 'time_slot' column into 'start_time' and 'end_time' and replacing 'time_slot'."
-        )
-        try:
-            # Removing 'Uhr' and splitting with keyword arguments
-            time_splits = (
-                df["time_slot"]
-                .str.replace(" Uhr", "")
-                .str.split(pat=" - ", n=1, expand=True)
-            )
-
-            # Create temporary columns for start and end times
-            df["start_time"] = pd.to_datetime(
-                time_splits[0].str.strip(), format="%H.%M"
-            ).dt.time
-            df["end_time"] = pd.to_datetime(
-                time_splits[1].str.strip(), format="%H.%M"
-            ).dt.time
-
-            # Find index of 'time_slot' to insert new columns at the same position
-            idx = df.columns.get_loc("time_slot")
-
-            # Insert 'start_time' and 'end_time' before removing 'time_slot'
-            df.insert(idx, "start_time", df.pop("start_time"))
-            df.insert(idx + 1, "end_time", df.pop("end_time"))
-
-            # Remove the original 'time_slot' column
-            df.drop("time_slot", axis=1, inplace=True)
-
-            logging.info(
-                "Successfully replaced 'time_slot' with 'start_time' and 'end_time'."
-            )
-        except Exception as e:
-            logging.error(f"Error processing 'time_slot': {e}")
-    else:
-        logging.warning(
+    if "time_slot" not in df.columns:
+        logger.warning(
             "The column 'time_slot' does not exist in the DataFrame. No action taken."
         )
+        return df
+    logger.info(
+        "Splitting 'time_slot' column into 'start_time' and 'end_time' and replacing 'time_slot'."
+    )
+    # Parse every distinct header once and broadcast the times through the codes
+    if isinstance(df["time_slot"].dtype, pd.CategoricalDtype):
+        codes = df["time_slot"].cat.codes.to_numpy()
+        headers = df["time_slot"].cat.categories
+    else:
+        codes, headers = pd.factorize(df["time_slot"])
+    slots = [parse_time_slot(header) for header in headers]
+    unparsed = [header for header, slot in zip(headers, slots) if slot is None]
+    if unparsed:
+        logger.warning(f"Dropping the rows of unparsable time slots: {unparsed}")
+    # A trailing None for the code -1 of missing headers
+    start_times = np.array([slot and slot[0] for slot in slots] + [None], dtype=object)
+    end_times = np.array([slot and slot[1] for slot in slots] + [None], dtype=object)
+
+    idx = df.columns.get_loc("time_slot")
+    df = df.drop(columns="time_slot")
+    df.insert(idx, "start_time", start_times[codes])
+    df.insert(idx + 1, "end_time", end_times[codes])
+    df = df[df["start_time"].notna()]
+
+    logger.info("Successfully replaced 'time_slot' with 'start_time' and 'end_time'.")
     # save_to_csv(df, "output/split_time_slot.csv")
     return df
 
 
-def convert_raw_event_data_to_list(df):
-    # Split the raw event data into a list
-    df["raw_details"] = df["raw_details"].str.split("\n")
-    return df
-
 ########################################################################################
 #                       CHECK FOR MULTIPLE EVENTS IN DETAILS CELL                      #
 ########################################################################################
 
-def check_multievent(df):
-    # Apply the modified logic to each entry in 'raw_details'
-    # Using a lambda function to check if the entry is a list and its length is greater than 4
-    df["multi_event"] = df['raw_details'].apply(lambda x: len(x) > 4 if isinstance(x, list) else False)
 
+def check_multievent(df):
+    # Cells with more lines than course, lecturer, location and details
+    df["multi_event"] = is_multi_event(df["raw_details"])
     return df
 
 
@@ -198,22 +260,46 @@ def check_multievent(df):
 ########################################################################################
 
 
-def create_df_from_pdf(pdf_path):
-    raw_data = extract_tables(pdf_path)
+def create_df_from_pdf(
+    pdf_path, use_cache=True, extract_workers=1, backend=DEFAULT_BACKEND
+):
+    # The PDF is opened once and shared by the cache key, tables and year lookup
+    if isinstance(pdf_path, TimetableDocument):
+        return _create_df_from_document(pdf_path, use_cache, extract_workers, backend)
+    with TimetableDocument(pdf_path) as document:
+        return _create_df_from_document(document, use_cache, extract_workers, backend)
+
+
+def _create_df_from_document(document, use_cache, extract_workers, backend):
+    # Unchanged PDFs are served from the cache without running Camelot/Ghostscript
+    cache_key = None
+    if use_cache:
+        cache_key = build_cache_key(document, backend)
+        df = load_cached_df(cache_key)
+        if df is not None:
+            save_to_csv(df, "output/create_df.csv")
+            return df
+
+    raw_data = extract_tables(document, workers=extract_workers, backend=backend)
     to_df = convert_tablelist_to_dataframe(raw_data)
+    # Dates are parsed once per day row, before the melt repeats them per slot
+    to_df = format_date(to_df, get_year(document))
     df = melt_df(to_df)
     # Drop all rows wher raw_details is ['']
     df = df[df["raw_details"] != ""]
     df = split_time_slot(df)
-    df = convert_raw_event_data_to_list(df)
-    df = format_date(df, get_year(pdf_path))
     df = df.sort_values(by=["date", "start_time"])
+    # Cells stay one string each (lines separated by "\n") in a flat buffer
+    df = apply_timetable_schema(df)
     df = check_multievent(df)
     save_to_csv(df, "output/create_df.csv")
+    if cache_key:
+        store_cached_df(df, cache_key)
     return df
 
 
 if __name__ == "__main__":
+    setup_logger()
     # Example usage
     pdf_path = "/Users/max/github/00_HSBI_UNI/py.hsbi-timetable/downloads/Stundenplan SoSe_2024_ELM 2.pdf"
     df = create_df_from_pdf(pdf_path)
@@ -1,51 +1,209 @@
+import json
 import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
 from webdav3.client import Client
 from timetable_scraper.libs.helper_functions import load_secrets
-
-# Set up the logger
+from timetable_scraper.libs.metrics import span
 from timetable_scraper.libs.log_config import setup_logger
-setup_logger()
+
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_DIR = "./downloads/"
+# ETag, Last-Modified and size of every downloaded PDF from the last sync
+MANIFEST_FILE = "./downloads/.manifest.json"
+MAX_DOWNLOAD_WORKERS = 4
+DOWNLOAD_TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    if not os.path.exists(manifest_file):
+        return {}
+    try:
+        with open(manifest_file, "r") as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable manifest {manifest_file}: {e}")
+        return {}
+
+
+def save_manifest(manifest, manifest_file=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(manifest_file), exist_ok=True)
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_file, manifest_file)
+
+
+def _remote_fingerprint(info):
+    return {
+        "etag": info.get("etag"),
+        "modified": info.get("modified"),
+        "size": info.get("size"),
+    }
+
+
+def create_session(config, max_workers=MAX_DOWNLOAD_WORKERS):
+    """HTTP session with a connection pool shared by all download threads."""
+    session = requests.Session()
+    session.auth = (config["credentials"]["username"], config["credentials"]["password"])
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def download_file(session, url, local_path, expected_size=None):
+    """
+    Stream a file to a temporary path next to local_path and rename it into place.
 
-def sync_timetables(output_path="./output/pdf_timetables/"):
-    config = load_secrets()
-    logging.info(config)
+    The rename only happens after the size has been verified, so an interrupted
+    transfer never leaves a truncated PDF behind.
+
+    Returns:
+    dict: Downloaded bytes, latency (time to the response headers), total
+    duration and throughput in bytes per second.
+    """
+    directory = os.path.dirname(local_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+    start = time.monotonic()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                latency = time.monotonic() - start
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    tmp_file.write(chunk)
+                    size += len(chunk)
+                if expected_size is None and "Content-Encoding" not in response.headers:
+                    expected_size = response.headers.get("Content-Length")
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        if expected_size is not None and int(expected_size) != size:
+            raise IOError(f"expected {expected_size} bytes, received {size}")
+        os.replace(tmp_path, local_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    duration = time.monotonic() - start
+    return {
+        "bytes": size,
+        "latency": latency,
+        "duration": duration,
+        "throughput": size / duration if duration else 0.0,
+    }
+
+
+def _file_url(hostname, remote_path):
+    parts = urlsplit(hostname)
+    return f"{parts.scheme}://{parts.netloc}{quote(remote_path)}"
+
+
+def sync_timetables(
+    output_path="./output/pdf_timetables/",
+    download_dir=DOWNLOAD_DIR,
+    manifest_file=MANIFEST_FILE,
+    config=None,
+    max_workers=MAX_DOWNLOAD_WORKERS,
+):
+    """
+    Download the timetable PDFs that changed since the last sync.
+
+    The share is listed with a single PROPFIND. A PDF is only downloaded if its
+    ETag, Last-Modified or size differs from the manifest, or if the local
+    copy is missing. Changed PDFs are downloaded concurrently over pooled
+    connections and written atomically.
+
+    Returns:
+    list[str] or None: Local paths of the downloaded (changed) PDFs, or None if
+    the share could not be listed.
+    """
+    with span("sync_timetables") as stage:
+        return _sync_timetables(download_dir, manifest_file, config, max_workers, stage)
+
+
+def _sync_timetables(download_dir, manifest_file, config, max_workers, stage):
+    config = config or load_secrets()
     options = {
         "webdav_hostname": config["urls"]["timetable"],
         "webdav_login": config["credentials"]["username"],
         "webdav_password": config["credentials"]["password"],
-        "verbose": True,
     }
     client = Client(options)
     client.verify = True  # To not check SSL certificates (Default = True)
 
     try:
-        files = client.list()
+        files = client.list(get_info=True)
     except Exception as e:
-        logging.error("Failed to list files: %s", e)
-        return
+        logger.error("Failed to list files: %s", e)
+        stage.error = True
+        return None
 
-    for i in files:
-        logging.info(i)
+    manifest = load_manifest(manifest_file)
+    to_download = []
 
-    # Download all files to a local directory
-    download_dir = "./downloads/"
+    for info in files:
+        file = os.path.basename(info["path"].rstrip("/"))
+        if info.get("isdir") or not file.endswith(".pdf"):
+            logger.info("Skipped file: %s", file)
+            continue
 
-    for file in files:
-        if file.endswith(".pdf"):
-            logging.info("Attempting to download file: %s", file)
+        local_path = os.path.join(download_dir, file)
+        fingerprint = _remote_fingerprint(info)
+        if manifest.get(file) == fingerprint and os.path.exists(local_path):
+            logger.info("Unchanged file: %s", file)
+            continue
+        to_download.append((file, info, local_path, fingerprint))
+
+    def download(item):
+        file, info, local_path, _ = item
+        logger.info("Attempting to download file: %s", file)
+        url = _file_url(config["urls"]["timetable"], info["path"])
+        return download_file(session, url, local_path, info.get("size"))
+
+    changed_files = []
+    session = create_session(config, max_workers)
+    session.verify = client.verify
+    total_start = time.monotonic()
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(item, executor.submit(download, item)) for item in to_download]
+        for (file, _, local_path, fingerprint), future in futures:
             try:
-                client.download_sync(
-                    remote_path=file, local_path=download_dir + file
-                )
-                logging.info("Downloaded file: %s", file)
+                stats = future.result()
             except Exception as e:
-                logging.error("Failed to download file %s: %s", file, e)
-        else:
-            logging.info("Skipped file: %s", file)
+                logger.error("Failed to download file %s: %s", file, e)
+                stage.error = True
+                continue
+            stage.add_bytes(stats["bytes"])
+            logger.info(
+                f"Downloaded file: {file} ({stats['bytes']} bytes, "
+                f"latency {stats['latency'] * 1000:.0f} ms, "
+                f"{stats['duration']:.2f} s, {stats['throughput'] / 1024:.0f} KiB/s)"
+            )
+            manifest[file] = fingerprint
+            changed_files.append(local_path)
+    if to_download:
+        logger.info(
+            f"Downloaded {len(changed_files)}/{len(to_download)} files in "
+            f"{time.monotonic() - total_start:.2f} s"
+        )
+
+    save_manifest(manifest, manifest_file)
+    logger.info(f"{len(changed_files)} changed timetable(s): {changed_files}")
+    return changed_files
 
 
 if __name__ == "__main__":
+    setup_logger()
     sync_timetables()
-    logging.info("Finished downloading timetables.")
+    logger.info("Finished downloading timetables.")
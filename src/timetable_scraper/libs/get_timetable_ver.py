@@ -1,72 +1,86 @@
-import re
 import logging
-import fitz  # PyMuPDF
 from pathlib import Path
 from datetime import datetime
 import csv
-
-# Set up the logger
+from timetable_scraper.libs.timetable_document import TimetableDocument
 from timetable_scraper.libs.log_config import setup_logger
-setup_logger()
+
 logger = logging.getLogger(__name__)
 
+VERSION_LOG_FILE = "output/version_log.csv"
+VERSION_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 
 def extract_version(pdf_path):
     """
     Extract the version date and time from the first page of a PDF.
 
     Args:
-    pdf_path (str): Path to the PDF file.
+    pdf_path (str or TimetableDocument): Path to the PDF file, or an already
+    opened document whose cached version is reused.
 
     Returns:
     datetime or None: The extracted version as a datetime object, or None if not found.
     """
-    try:
-        logging.info(f"Starting to extract version from: {pdf_path}")
-        pdf_document = fitz.open(pdf_path)
-        first_page_text = pdf_document[0].get_text()  # type: ignore
-        version_pattern = r"Version:\s*(\d{2}\.\d{2}\.\d{4}),\s*(\d{2}:\d{2})\s*Uhr"
-        match = re.search(version_pattern, first_page_text)
-        if match:
-            date_version = match.group(1)  # Example: "17.04.2024"
-            time_version = match.group(2)  # Example: "10:01"
-            version_datetime = datetime.strptime(
-                f"{date_version} {time_version}", "%d.%m.%Y %H:%M"
-            )
-            logging.info(f"Extracted version: {version_datetime}")
-            return version_datetime
-        else:
-            logging.warning("Version not found in the PDF.")
-            return None
-    except Exception as e:
-        logging.error(f"Failed to extract version due to an error: {e}")
-        return None
+    if isinstance(pdf_path, TimetableDocument):
+        return pdf_path.version
+    with TimetableDocument(pdf_path) as document:
+        return document.version
 
 
-def log_pdf_versions(downloads_path, csv_file_path):
-    downloads_dir = Path(downloads_path)
-    pdf_files = list(downloads_dir.glob("*.pdf"))
+def read_version_log(csv_file_path=VERSION_LOG_FILE):
+    """
+    Read the last logged version of every PDF.
+
+    Returns:
+    dict: File name -> version datetime of its most recent row.
+    """
+    versions = {}
+    if not Path(csv_file_path).exists():
+        return versions
+    with open(csv_file_path, "r", newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            try:
+                versions[row["File"]] = datetime.strptime(row["Version"], VERSION_FORMAT)
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Ignoring malformed row in {csv_file_path}: {row}")
+    return versions
 
+
+def append_version_log(csv_file_path, versions):
+    """
+    Append one row per (file name, version datetime) pair to the version log.
+    """
+    Path(csv_file_path).parent.mkdir(parents=True, exist_ok=True)
     with open(csv_file_path, "a", newline="") as csvfile:
         csv_writer = csv.writer(csvfile)
 
         if csvfile.tell() == 0:
             csv_writer.writerow(["Timestamp", "Version", "File"])
 
-        for pdf_file in pdf_files:
-            version_datetime = extract_version(pdf_file)
+        timestamp = datetime.now().strftime(VERSION_FORMAT)
+        for file_name, version_datetime in versions:
+            csv_writer.writerow(
+                [timestamp, version_datetime.strftime(VERSION_FORMAT), file_name]
+            )
+
 
-            if version_datetime:
-                csv_writer.writerow(
-                    [
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        version_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-                        pdf_file.name,
-                    ]
-                )
-            else:
-                print(f"Failed to extract version from {pdf_file.name}.")
+def log_pdf_versions(downloads_path, csv_file_path):
+    downloads_dir = Path(downloads_path)
+    pdf_files = list(downloads_dir.glob("*.pdf"))
+
+    versions = []
+    for pdf_file in pdf_files:
+        with TimetableDocument(pdf_file) as document:
+            version_datetime = document.version
+
+        if version_datetime:
+            versions.append((pdf_file.name, version_datetime))
+        else:
+            print(f"Failed to extract version from {pdf_file.name}.")
+    append_version_log(csv_file_path, versions)
 
 
 if __name__ == "__main__":
-    log_pdf_versions("downloads", "output/version_log.csv")
+    setup_logger()
+    log_pdf_versions("downloads", VERSION_LOG_FILE)
@@ -1,28 +1,29 @@
 import logging
-import pandas as pd
 import yaml
 from timetable_scraper.libs.log_config import setup_logger
-# Set up the logger
-setup_logger()
+
 logger = logging.getLogger(__name__)
 
 
 def read_csv(input_path):
+    # pandas is imported here so loading the secrets stays cheap for the CLI
+    import pandas as pd
+
     try:
         df = pd.read_csv(input_path)
-        logging.info(f"Successfully read data from: {input_path}")
+        logger.info(f"Successfully read data from: {input_path}")
         return df
     except Exception as e:
-        logging.error(f"Failed to read data from {input_path}: {e}")
+        logger.error(f"Failed to read data from {input_path}: {e}")
         return None
 
 
 def save_to_csv(df, output_path):
     try:
         df.to_csv(output_path, index=False)
-        logging.info(f"Saved processed data to: {output_path}")
+        logger.info(f"Saved processed data to: {output_path}")
     except Exception as e:
-        logging.error(f"Failed to save data to {output_path}: {e}")
+        logger.error(f"Failed to save data to {output_path}: {e}")
 
 
 def load_secrets(filename="config/secrets.yaml"):
@@ -32,16 +33,11 @@ def load_secrets(filename="config/secrets.yaml"):
         secrets = yaml.safe_load(file)
     return secrets
 
-def save_events_to_json(df, output_path):
-    """Save the extracted events to a JSON file."""
-    try:
-        df.to_json(output_path, orient="records", lines=False)
-        logging.info(f"Successfully saved DataFrame to {output_path}")
-    except Exception as e:
-        logging.error(f"Failed to save DataFrame to JSON: {e}")
-
 
 if __name__ == "__main__":
+    import pandas as pd
+
+    setup_logger()
     # Example usage
     df = pd.DataFrame({"A": [1, 2, 3], "B": [4, 5, 6]})
     output_path = "./output/test_data.csv"
@@ -1,21 +1,193 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+from datetime import datetime, timezone
 
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s (%(filename)s:%(lineno)d)"
+LOG_FILE = "logfile.log"
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+# Third-party loggers that are too chatty at INFO
+DEFAULT_MODULE_LEVELS = {
+    "googleapiclient.discovery_cache": "ERROR",
+    "httpx": "WARNING",
+    "pdfminer": "WARNING",
+}
 
-def setup_logger():
-    # Get the root logger
-    logger = logging.getLogger()
+_queue_handler = None
+_listener = None
+# Records of worker processes, written by a second listener of the main process
+_worker_queue = None
+_worker_listener = None
+# Root level and module levels resolved by setup_logger, passed on to workers
+_levels = None
 
-    # Configure the basic logging settings only if not already configured
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s (%(filename)s:%(lineno)d)",
-    )
-    # Create a file handler to write logs to a file
-    file_handler = logging.FileHandler("logfile.log")
-    file_handler.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(message)s (%(filename)s:%(lineno)d)"
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "file": record.filename,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _parse_module_levels(value):
+    # "googleapiclient=WARNING,timetable_scraper.libs.openai_parser=DEBUG"
+    levels = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _create_handlers(log_file, json_logs):
+    formatter = JsonFormatter() if json_logs else logging.Formatter(LOG_FORMAT)
+    console_handler = logging.StreamHandler()
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
     )
-    file_handler.setFormatter(formatter)
-    # Add the file handler to the logger
-    logger.addHandler(file_handler)
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
+    return [console_handler, file_handler]
+
+
+def stop_logger():
+    """Flush the queued records and stop the listener threads."""
+    global _listener, _worker_listener
+    if _worker_listener is not None:
+        _worker_listener.stop()
+        _worker_listener = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _reset_logging_after_fork():
+    # The listener threads do not survive a fork. Forked children send their
+    # records to the worker queue of the parent if there is one, otherwise
+    # they write through the inherited handlers themselves.
+    global _queue_handler, _listener, _worker_listener
+    if _listener is None:
+        return
+    root_logger = logging.getLogger()
+    root_logger.removeHandler(_queue_handler)
+    if _worker_queue is not None:
+        root_logger.addHandler(logging.handlers.QueueHandler(_worker_queue))
+    else:
+        for handler in _listener.handlers:
+            root_logger.addHandler(handler)
+    _queue_handler = None
+    _listener = None
+    _worker_listener = None
+
+
+def _apply_levels(root_logger, level, module_levels):
+    root_logger.setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+def setup_logger(level=None, log_file=None, json_logs=None, module_levels=None):
+    """
+    Configure the root logger once per process; later calls are no-ops.
+
+    Records are put on a queue by a QueueHandler and written to the console and
+    a rotating log file by a QueueListener thread, so file I/O stays off the
+    calling thread. Worker processes send their records back to this process
+    (see worker_log_config), so only one process writes and rotates the file.
+
+    Every option falls back to an environment variable: LOG_LEVEL, LOG_FILE,
+    LOG_JSON=1 for JSON lines, and LOG_MODULE_LEVELS as comma-separated
+    "logger=LEVEL" pairs.
+    """
+    global _queue_handler, _listener, _levels
+    root_logger = logging.getLogger()
+    if getattr(root_logger, "_timetable_configured", False):
+        return
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    log_file = log_file or os.environ.get("LOG_FILE", LOG_FILE)
+    if json_logs is None:
+        json_logs = os.environ.get("LOG_JSON", "").lower() in ("1", "true", "yes")
+    levels = dict(DEFAULT_MODULE_LEVELS)
+    levels.update(_parse_module_levels(os.environ.get("LOG_MODULE_LEVELS", "")))
+    levels.update(module_levels or {})
+
+    _levels = (level.upper() if isinstance(level, str) else level, levels)
+    _apply_levels(root_logger, *_levels)
+
+    handlers = _create_handlers(log_file, json_logs)
+    if multiprocessing.parent_process() is not None:
+        # Process started without worker_log_config: no listener thread that
+        # could outlive it
+        for handler in handlers:
+            root_logger.addHandler(handler)
+    else:
+        _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(
+            _queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        _listener.start()
+        root_logger.addHandler(_queue_handler)
+        atexit.register(stop_logger)
+    root_logger._timetable_configured = True
+
+
+def worker_log_config():
+    """
+    Arguments for setup_worker_logger, e.g. the initargs of a process pool.
+
+    The first call in the main process starts a listener thread that writes
+    the records of the worker processes through the handlers of this process.
+    Called in a worker (nested pools), the queue of its parent is passed on.
+    If logging is not configured, the workers fall back to setup_logger.
+    """
+    global _worker_queue, _worker_listener
+    if _worker_queue is None and _listener is not None:
+        _worker_queue = multiprocessing.Queue()
+        _worker_listener = logging.handlers.QueueListener(
+            _worker_queue, *_listener.handlers, respect_handler_level=True
+        )
+        _worker_listener.start()
+    if _levels is None:
+        return (_worker_queue, None, None)
+    return (_worker_queue, *_levels)
+
+
+def setup_worker_logger(log_queue=None, level=None, module_levels=None):
+    """
+    Initializer of worker processes: send every record to log_queue.
+
+    Replaces the handlers inherited from a forked parent, so the worker never
+    writes to the log file itself. Without a queue this is setup_logger.
+    """
+    global _worker_queue, _levels
+    if log_queue is None:
+        setup_logger(level=level, module_levels=module_levels)
+        return
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    _levels = (level or "INFO", module_levels or dict(DEFAULT_MODULE_LEVELS))
+    _apply_levels(root_logger, *_levels)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger._timetable_configured = True
+    _worker_queue = log_queue
+
+
+os.register_at_fork(after_in_child=_reset_logging_after_fork)
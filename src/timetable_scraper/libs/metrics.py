@@ -0,0 +1,169 @@
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE = "output/timetable_scraper.prom"
+METRIC_PREFIX = "timetable_scraper"
+_COUNTERS = ("count", "errors", "retries", "bytes", "seconds")
+
+
+def _empty_stage():
+    return dict.fromkeys(_COUNTERS, 0) | {"max_seconds": 0.0}
+
+
+class Span:
+    """Measurements of one timed call, updated by the instrumented code."""
+
+    def __init__(self, name):
+        self.name = name
+        self.retries = 0
+        self.bytes = 0
+        # Set by code that handles its own failures instead of raising
+        self.error = False
+
+    def add_retry(self, count=1):
+        self.retries += count
+
+    def add_bytes(self, count):
+        self.bytes += count or 0
+
+
+class Metrics:
+    """
+    Thread-safe per-stage counters: calls, errors, retries, bytes and seconds.
+
+    Worker processes start from reset(), return snapshot() with their result,
+    and the parent folds it in with merge().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def _record(self, name, seconds, error, retries, byte_count):
+        with self._lock:
+            stage = self._stages.setdefault(name, _empty_stage())
+            stage["count"] += 1
+            stage["errors"] += int(error)
+            stage["retries"] += retries
+            stage["bytes"] += byte_count
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+
+    @contextmanager
+    def span(self, name):
+        span = Span(name)
+        start = time.perf_counter()
+        error = False
+        try:
+            yield span
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self._record(
+                name,
+                time.perf_counter() - start,
+                error or span.error,
+                span.retries,
+                span.bytes,
+            )
+
+    def timed(self, name=None):
+        """Decorator that wraps every call of the function in a span."""
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name or function.__name__):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stage) for name, stage in self._stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, other in snapshot.items():
+                stage = self._stages.setdefault(name, _empty_stage())
+                for counter in _COUNTERS:
+                    stage[counter] += other[counter]
+                stage["max_seconds"] = max(stage["max_seconds"], other["max_seconds"])
+
+    def summary_table(self):
+        header = (
+            f"{'stage':<24}{'calls':>8}{'errors':>8}{'retries':>9}"
+            f"{'total s':>10}{'mean ms':>10}{'max ms':>10}{'bytes':>12}"
+        )
+        lines = [header, "-" * len(header)]
+        for name, stage in sorted(self.snapshot().items()):
+            mean = stage["seconds"] / stage["count"] if stage["count"] else 0.0
+            lines.append(
+                f"{name:<24}{stage['count']:>8}{stage['errors']:>8}"
+                f"{stage['retries']:>9}{stage['seconds']:>10.2f}"
+                f"{mean * 1000:>10.1f}{stage['max_seconds'] * 1000:>10.1f}"
+                f"{stage['bytes']:>12}"
+            )
+        return "\n".join(lines)
+
+    def log_summary(self):
+        if self._stages:
+            logger.info("Stage timings:\n" + self.summary_table())
+
+    def prometheus_text(self):
+        """The counters in the Prometheus text exposition format."""
+        metrics = [
+            ("calls_total", "count", "Number of calls per pipeline stage."),
+            ("errors_total", "errors", "Number of failed calls."),
+            ("retries_total", "retries", "Number of retried requests."),
+            ("bytes_total", "bytes", "Number of bytes transferred."),
+            ("seconds_total", "seconds", "Total time spent in the stage."),
+            ("max_seconds", "max_seconds", "Slowest call of the stage."),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for suffix, key, help_text in metrics:
+            metric = f"{METRIC_PREFIX}_stage_{suffix}"
+            metric_type = "gauge" if key == "max_seconds" else "counter"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for name, stage in sorted(snapshot.items()):
+                lines.append(f'{metric}{{stage="{name}"}} {stage[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=METRICS_FILE):
+        """Write the textfile for the node exporter's textfile collector."""
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # The collector may read at any time, so replace the file atomically
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file:
+                file.write(self.prometheus_text())
+            os.replace(tmp_path, path)
+            logger.info(f"Wrote metrics to {path}")
+        except OSError as e:
+            logger.error(f"Failed to write metrics to {path}: {e}")
+
+    def report(self, path=METRICS_FILE):
+        """End-of-run summary: log the table and export the textfile."""
+        self.log_summary()
+        self.write_prometheus(path)
+
+
+# Process-wide registry used by the instrumented modules
+metrics = Metrics()
+span = metrics.span
+timed = metrics.timed
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Constants for the persistent OpenAI parse cache
+CACHE_DB_FILE = "cache/openai_parser.sqlite3"
+MAX_AGE_DAYS = 180
+MAX_ENTRIES = 10000
+
+
+def normalize_details(details):
+    """Collapse whitespace so that cosmetic differences map to the same entry."""
+    return " ".join(details.split())
+
+
+class ParseCache:
+    """
+    SQLite-backed memoization of openai_parser results.
+
+    Entries are keyed by the normalized details string plus a version string
+    (model and system prompt), so changing either invalidates old parses.
+    """
+
+    def __init__(
+        self, db_file=CACHE_DB_FILE, max_age_days=MAX_AGE_DAYS, max_entries=MAX_ENTRIES
+    ):
+        self.db_file = db_file
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        db_dir = os.path.dirname(db_file)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # The cache is shared by the parsing workers of process_data and by the
+        # OpenAI threads of the pipeline, which take turns through the lock
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS parses ("
+            " key TEXT PRIMARY KEY,"
+            " events TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(details, version):
+        normalized = normalize_details(details)
+        return hashlib.sha256(f"{version}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, details, version):
+        """Return the cached events for the details, or None on a cache miss."""
+        key = self.make_key(details, version)
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT events FROM parses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute(
+                "UPDATE parses SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, details, version, events):
+        key = self.make_key(details, version)
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO parses (key, events, created_at, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(events, ensure_ascii=False), now, now),
+            )
+            self.connection.commit()
+
+    def evict(self):
+        """Drop entries older than max_age_days and keep at most max_entries."""
+        cutoff = time.time() - self.max_age_days * 24 * 60 * 60
+        expired = self.connection.execute(
+            "DELETE FROM parses WHERE last_used < ?", (cutoff,)
+        ).rowcount
+        overflow = self.connection.execute(
+            "DELETE FROM parses WHERE key NOT IN"
+            " (SELECT key FROM parses ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,),
+        ).rowcount
+        self.connection.commit()
+        if expired or overflow:
+            logger.info(f"Evicted {expired + overflow} entries from the parse cache.")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self.evict()
+        self.connection.close()
+        logger.info(
+            f"OpenAI parse cache: {self.hits} hits, {self.misses} misses "
+            f"({self.db_file})"
+        )
@@ -1,85 +1,272 @@
+import asyncio
+import hashlib
 import json
 import logging
 import os
-from openai import OpenAI
+import random
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    OpenAI,
+    RateLimitError,
+)
 from timetable_scraper.libs.helper_functions import load_secrets
 from timetable_scraper.libs.log_config import setup_logger
+from timetable_scraper.libs.metrics import span
 
-# Set up the logger
-setup_logger()
 logger = logging.getLogger(__name__)
 
-def openai_parser(api_key, details):
-    """Parse complex multi-line timetable event details into structured JSON using OpenAI API."""
-    client = OpenAI(api_key=api_key)
-    failure_response = [{
+MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = (
+    "You are provided with event details from a timetable, including course names, lecturers, "
+    "locations, and additional details. Your task is to parse these details into a structured JSON "
+    "format compliant with RFC8259, where each JSON object includes only 'course', 'lecturer', 'location', "
+    "and 'details'. The 'lecturer' field should be an array containing multiple names, regardless of their "
+    "position in the input. Here is a list of some existing names: ['Herth', 'Wetter', 'Battermann', "
+    "'P. Wette', 'Luhmeyer', 'Schünemann', 'P. Wette', 'Simon']. Ensure no additional fields are introduced. "
+    "For example, if the input is 'Programmieren in C, P. Wette/ D 216 Praktikum 1, Gr. B Simon "
+    "Wechselstromtechnik Battermann/ D 221 Praktikum 2, Gr. A Schünemann', the output should be "
+    "[{'course': 'Programmieren in C', 'lecturer': ['P. Wette', 'Simon'], 'location': 'D 216', 'details': 'Praktikum 1, Gr. B'}, "
+    "{'course': 'Wechselstromtechnik', 'lecturer': ['Battermann', 'Schünemann'], 'location': 'D 221', 'details': 'Praktikum 2, Gr. A'}]. "
+    "Correctly identify and include all lecturers, even if they appear after location or detail descriptions, ensuring accurate and comprehensive "
+    "data representation in each event."
+)
+# Cached parses are only reused for the same model and prompt
+PROMPT_VERSION = hashlib.sha256(
+    f"{MODEL}\n{SYSTEM_PROMPT}".encode("utf-8")
+).hexdigest()[:16]
+
+
+MAX_RETRIES = 3
+MAX_CONCURRENCY = 8
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+
+def _failure_response():
+    return [{
         "course": "!!! AiParsing Failure!!!",
         "lecturer": [],
         "location": "",
         "details": "",
     }]
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are provided with event details from a timetable, including course names, lecturers, "
-                "locations, and additional details. Your task is to parse these details into a structured JSON "
-                "format compliant with RFC8259, where each JSON object includes only 'course', 'lecturer', 'location', "
-                "and 'details'. The 'lecturer' field should be an array containing multiple names, regardless of their "
-                "position in the input. Here is a list of some existing names: ['Herth', 'Wetter', 'Battermann', "
-                "'P. Wette', 'Luhmeyer', 'Schünemann', 'P. Wette', 'Simon']. Ensure no additional fields are introduced. "
-                "For example, if the input is 'Programmieren in C, P. Wette/ D 216 Praktikum 1, Gr. B Simon "
-                "Wechselstromtechnik Battermann/ D 221 Praktikum 2, Gr. A Schünemann', the output should be "
-                "[{'course': 'Programmieren in C', 'lecturer': ['P. Wette', 'Simon'], 'location': 'D 216', 'details': 'Praktikum 1, Gr. B'}, "
-                "{'course': 'Wechselstromtechnik', 'lecturer': ['Battermann', 'Schünemann'], 'location': 'D 221', 'details': 'Praktikum 2, Gr. A'}]. "
-                "Correctly identify and include all lecturers, even if they appear after location or detail descriptions, ensuring accurate and comprehensive "
-                "data representation in each event."
-            ),
-        },
+
+
+def _build_messages(details):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": details},
     ]
 
-    max_retries = 3
-    for attempt in range(max_retries):
+
+def _to_event_list(structured_data):
+    """Normalize the decoded model output to a list of events, or None if invalid."""
+    if isinstance(structured_data, dict):
+        return [structured_data]  # Ensure it's a list of dictionaries
+    if isinstance(structured_data, list):
+        return structured_data
+    return None
+
+
+def openai_parser(api_key, details, cache=None, client=None):
+    """
+    Parse complex multi-line timetable event details into structured JSON using OpenAI API.
+
+    If a ParseCache is given, stored results are returned without a network call
+    and successful parses are written back to it. Pass a client to reuse it
+    across calls.
+    """
+    if cache is not None:
+        cached_events = cache.get(details, PROMPT_VERSION)
+        if cached_events is not None:
+            logger.debug("Returning cached parse for multi-event details.")
+            return cached_events
+
+    if client is None:
+        client = OpenAI(api_key=api_key)
+    messages = _build_messages(details)
+
+    with span("openai_parser") as stage:
+        max_retries = MAX_RETRIES
+        for attempt in range(max_retries):
+            if attempt:
+                stage.add_retry()
+            try:
+                response = client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    temperature=0,
+                    max_tokens=512,
+                    top_p=1,
+                )
+                structured_response = response.choices[0].message.content
+                if structured_response is None:
+                    logger.warning("Received no content to parse, attempting retry.")
+                    continue  # Continue the retry loop if no response content
+                structured_data = json.loads(structured_response)  # Parse the JSON here
+                logger.debug("Successfully parsed the response.")
+                events = _to_event_list(structured_data)
+                if events is None:
+                    logger.warning("Parsed data is not a list or dict.")
+                    stage.error = True
+                    return _failure_response()
+                if cache is not None:
+                    cache.put(details, PROMPT_VERSION, events)
+                return events
+            except json.JSONDecodeError as e:
+                logger.warning(
+                    f"Retry {attempt + 1}/{max_retries}: Failed to parse JSON response. {str(e)} Trying again."
+                )
+            except (IndexError, KeyError, Exception) as e:
+                logger.error(
+                    f"Error during parsing: {e}. Attempt {attempt + 1} of {max_retries}."
+                )
+                if attempt == max_retries - 1:
+                    stage.error = True
+                    logger.critical(
+                        "Error parsing details after several attempts, please check the input format and try again."
+                    )
+                    return _failure_response()
+
+        logger.error("Failed to obtain a valid response after multiple attempts.")
+        stage.error = True
+        return _failure_response()
+
+
+########################################################################################
+#                       CONCURRENT PARSING OF MULTI-EVENT DETAILS                      #
+########################################################################################
+
+
+def _backoff_delay(attempt, error=None):
+    """Exponential backoff with jitter, honouring a Retry-After header if present."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
         try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0,
-                max_tokens=512,
-                top_p=1,
-            )
-            structured_response = response.choices[0].message.content
-            if structured_response is None:
-                logging.warning("Received no content to parse, attempting retry.")
-                continue  # Continue the retry loop if no response content
-            structured_data = json.loads(structured_response)  # Parse the JSON here
-            logging.info("Successfully parsed the response.")
-            if isinstance(structured_data, dict):
-                return [structured_data]  # Ensure it's a list of dictionaries
-            elif isinstance(structured_data, list):
-                return structured_data
-            else:
-                logging.warning("Parsed data is not a list or dict.")
-                return failure_response
-        except json.JSONDecodeError as e:
-            logging.warning(
-                f"Retry {attempt + 1}/{max_retries}: Failed to parse JSON response. {str(e)} Trying again."
-            )
-        except (IndexError, KeyError, Exception) as e:
-            logging.error(
-                f"Error during parsing: {e}. Attempt {attempt + 1} of {max_retries}."
-            )
-            if attempt == max_retries - 1:
-                logging.critical(
-                    "Error parsing details after several attempts, please check the input format and try again."
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_BASE_SECONDS * 2**attempt, BACKOFF_MAX_SECONDS)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def async_openai_parser(client, details, semaphore, max_retries=MAX_RETRIES):
+    """Async counterpart of openai_parser that shares one client and a semaphore."""
+    messages = _build_messages(details)
+    with span("openai_parser") as stage:
+        for attempt in range(max_retries):
+            if attempt:
+                stage.add_retry()
+            try:
+                async with semaphore:
+                    response = await client.chat.completions.create(
+                        model=MODEL,
+                        messages=messages,
+                        temperature=0,
+                        max_tokens=512,
+                        top_p=1,
+                    )
+                structured_response = response.choices[0].message.content
+                if structured_response is None:
+                    logger.warning("Received no content to parse, attempting retry.")
+                    continue
+                events = _to_event_list(json.loads(structured_response))
+                if events is None:
+                    logger.warning("Parsed data is not a list or dict.")
+                    stage.error = True
+                    return None
+                return events
+            except (RateLimitError, APIConnectionError, APITimeoutError) as e:
+                if attempt == max_retries - 1:
+                    # No attempt follows, so there is nothing to back off for
+                    logger.warning(
+                        f"Retry {attempt + 1}/{max_retries}: {type(e).__name__}."
+                    )
+                    continue
+                delay = _backoff_delay(attempt, e)
+                logger.warning(
+                    f"Retry {attempt + 1}/{max_retries}: {type(e).__name__}, "
+                    f"backing off for {delay:.1f}s."
+                )
+                await asyncio.sleep(delay)
+            except json.JSONDecodeError as e:
+                logger.warning(
+                    f"Retry {attempt + 1}/{max_retries}: Failed to parse JSON response. {str(e)} Trying again."
+                )
+            except Exception as e:
+                logger.error(
+                    f"Error during parsing: {e}. Attempt {attempt + 1} of {max_retries}."
                 )
-                return failure_response
+        logger.error("Failed to obtain a valid response after multiple attempts.")
+        stage.error = True
+        return None
+
+
+async def _parse_all(api_key, pending, max_concurrency, client=None):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    owns_client = client is None
+    if owns_client:
+        client = AsyncOpenAI(api_key=api_key, max_retries=0)
+    try:
+        results = await asyncio.gather(
+            *(async_openai_parser(client, details, semaphore) for details in pending)
+        )
+    finally:
+        if owns_client:
+            await client.close()
+    return dict(zip(pending, results))
+
+
+def parse_multi_events(
+    api_key, details_list, cache=None, max_concurrency=MAX_CONCURRENCY, client=None
+):
+    """
+    Parse many multi-event details strings concurrently.
+
+    Identical strings are parsed once, cached results are served without a
+    network call, and the remaining requests share a single AsyncOpenAI client
+    with at most max_concurrency requests in flight.
+
+    Args:
+    api_key (str): OpenAI API key.
+    details_list (list[str]): Details strings, duplicates allowed.
+    cache (ParseCache, optional): Persistent parse cache.
+    max_concurrency (int): Maximum number of concurrent API requests.
+    client (AsyncOpenAI, optional): Client to use instead of creating one, e.g.
+    a stub for benchmarks. It is not closed.
+
+    Returns:
+    dict: Maps each distinct details string to its list of parsed events.
+    """
+    parsed = {}
+    pending = []
+    for details in dict.fromkeys(details_list):
+        cached_events = cache.get(details, PROMPT_VERSION) if cache else None
+        if cached_events is not None:
+            parsed[details] = cached_events
+        else:
+            pending.append(details)
+
+    logger.info(
+        f"Parsing {len(pending)} distinct multi-event cells with OpenAI "
+        f"({len(parsed)} served from cache)."
+    )
+    if pending:
+        results = asyncio.run(_parse_all(api_key, pending, max_concurrency, client))
+        for details, events in results.items():
+            if events is None:
+                parsed[details] = _failure_response()
+                continue
+            parsed[details] = events
+            if cache is not None:
+                cache.put(details, PROMPT_VERSION, events)
+    return parsed
 
-    logging.error("Failed to obtain a valid response after multiple attempts.")
-    return failure_response
 
 if __name__ == "__main__":
+    setup_logger()
     # Test the function
     config = load_secrets()
     api_key = config["api_key"]
@@ -2,15 +2,23 @@ import pandas as pd
 import logging
 from timetable_scraper.libs.camelot_raw_pdf_to_df import create_df_from_pdf
 from timetable_scraper.libs.log_config import setup_logger
-from timetable_scraper.libs.openai_parser import openai_parser
-from timetable_scraper.libs.helper_functions import (
-    save_to_csv,
-    save_events_to_json,
-    load_secrets,
+from timetable_scraper.libs.openai_cache import ParseCache
+from timetable_scraper.libs.openai_parser import MAX_CONCURRENCY, parse_multi_events
+from timetable_scraper.libs.rule_based_parser import LecturerIndex, rule_based_parser
+from timetable_scraper.libs.helper_functions import save_to_csv, load_secrets
+from timetable_scraper.libs.timetable_event import (
+    encode_lecturers,
+    events_from_df,
+    save_events_jsonl,
+)
+from timetable_scraper.libs.timetable_schema import (
+    LINE_SEPARATOR,
+    apply_events_schema,
+    details_key,
+    details_keys,
+    details_lines,
 )
 
-# Set up the logger
-setup_logger()
 logger = logging.getLogger(__name__)
 
 ########################################################################################
@@ -18,75 +26,234 @@ logger = logging.getLogger(__name__)
 ########################################################################################
 
 
-def process_data(df, api_key):
-    processed_events_columns = [
-        "date",
-        "start_time",
-        "end_time",
-        "course",
-        "lecturer",
-        "location",
-        "details",
-    ]
-    processed_events = []
-
-    for _, row in df.iterrows():
-        raw_details = row["raw_details"]
-        logger.info(f"Processing row: {row.to_dict()}")
-        if row["multi_event"]:
-            logger.info("Detected multi-event row, invoking openai_parser.")
-            details_string = ", ".join(raw_details)
-            parsed_events = openai_parser(api_key, details_string)
-            logger.info(f"Parsed events: {parsed_events}")
-            if isinstance(parsed_events, list):  # Ensure parsed_events is a list
-                for event in parsed_events:
-                    if isinstance(event, dict):  # Ensure each event is a dictionary
-                        processed_event = {
-                            "date": row["date"],
-                            "start_time": row["start_time"],
-                            "end_time": row["end_time"],
-                            "course": event.get("course", ""),
-                            "lecturer": event.get("lecturer", []),
-                            "location": event.get("location", ""),
-                            "details": event.get("details", ""),
-                        }
-                        processed_events.append(processed_event)
-                        logger.info(f"Added parsed event: {processed_event}")
-            else:
-                logger.warning(f"Parsed events is not a list: {parsed_events}")
+# Rows per chunk when the events are streamed with iter_events
+CHUNK_ROWS = 500
+
+PROCESSED_EVENTS_COLUMNS = [
+    "date",
+    "start_time",
+    "end_time",
+    "course",
+    "lecturer",
+    "location",
+    "details",
+]
+
+
+def _single_events(df):
+    # Lines of a single event: course, lecturer, location, details...
+    raw_details = details_lines(df["raw_details"])
+    # Encoded once per distinct lecturer instead of once per row
+    lecturers = (
+        raw_details.str[1]
+        .fillna("Unknown Lecturer")
+        .astype("category")
+        .cat.rename_categories(lambda lecturer: encode_lecturers([lecturer]))
+    )
+    return pd.DataFrame(
+        {
+            "date": df["date"],
+            "start_time": df["start_time"],
+            "end_time": df["end_time"],
+            "course": raw_details.str[0].fillna("Unknown Course"),
+            "lecturer": lecturers,
+            "location": raw_details.str[2].fillna("Unknown Location"),
+            "details": raw_details.str[3].fillna(""),
+        }
+    )
+
+
+def _multi_events(df, parsed_details):
+    # One row per parsed event, the cell's date and time are repeated by explode
+    events = details_keys(df["raw_details"]).map(parsed_details).explode()
+    events = events[events.map(lambda event: isinstance(event, dict))]
+    rows = df.loc[events.index]
+    return pd.DataFrame(
+        {
+            "date": rows["date"],
+            "start_time": rows["start_time"],
+            "end_time": rows["end_time"],
+            "course": events.str.get("course").fillna(""),
+            "lecturer": pd.Series(
+                [encode_lecturers(event.get("lecturer")) for event in events],
+                index=events.index,
+                dtype=object,
+            ),
+            "location": events.str.get("location").fillna(""),
+            "details": events.str.get("details").fillna(""),
+        }
+    )
+
+
+def assemble_events(df, parsed_details):
+    """
+    Build one row per event from the melted timetable.
+
+    Single-event cells are split column-wise from raw_details, multi-event cells
+    are looked up in parsed_details (details_key of the cell -> list of event dicts)
+    and exploded. The events keep the order of the timetable rows.
+
+    Returns:
+    pd.DataFrame: The events with the PROCESSED_EVENTS_COLUMNS. Times, course,
+    lecturer (JSON encoded, see encode_lecturers) and location are categoricals.
+    """
+    for details_string, parsed_events in parsed_details.items():
+        if not isinstance(parsed_events, list):
+            logger.warning(f"Parsed events is not a list: {parsed_events}")
+            parsed_details[details_string] = []
+
+    df = df.reset_index(drop=True)
+    multi_event = df["multi_event"].astype(bool)
+    frames = [_single_events(df[~multi_event])]
+    if multi_event.any():
+        frames.append(_multi_events(df[multi_event], parsed_details))
+    processed_df = pd.concat(frames).sort_index(kind="stable").reset_index(drop=True)
+    return apply_events_schema(processed_df[PROCESSED_EVENTS_COLUMNS].copy())
+
+
+def parse_cells_by_rules(df, lecturers, parsed_details):
+    """
+    Split the multi-event cells of df with the rule-based parser.
+
+    Cells already in parsed_details (details_key of the cell -> list of event dicts)
+    are skipped, newly parsed cells are added to it.
+
+    Returns:
+    list[str]: The distinct details strings left for the OpenAI parser.
+    """
+    rule_parsed = 0
+    multi_event_details = {}
+    for raw_details in df.loc[df["multi_event"], "raw_details"]:
+        details_string = details_key(raw_details)
+        if details_string in parsed_details or details_string in multi_event_details:
+            continue
+        events = rule_based_parser(raw_details.split(LINE_SEPARATOR), lecturers)
+        if events is not None:
+            parsed_details[details_string] = events
+            rule_parsed += 1
         else:
-            # event = {
-            #     "date": row["date"],
-            #     "start_time": row["start_time"],
-            #     "end_time": row["end_time"],
-            #     "course": raw_details[0],
-            #     "lecturer": [raw_details[1]],
-            #     "location": raw_details[2],
-            #     "details": raw_details[3] if len(raw_details) > 3 else "",
-            # }
-            event = {
-                "date": row["date"],
-                "start_time": row["start_time"],
-                "end_time": row["end_time"],
-                "course": raw_details[0] if len(raw_details) > 0 else "Unknown Course",
-                "lecturer": [raw_details[1]]
-                if len(raw_details) > 1
-                else ["Unknown Lecturer"],
-                "location": raw_details[2]
-                if len(raw_details) > 2
-                else "Unknown Location",
-                "details": raw_details[3] if len(raw_details) > 3 else "",
-            }
-
-            processed_events.append(event)
-            logger.info(f"Added single event: {event}")
-
-    processed_df = pd.DataFrame(processed_events, columns=processed_events_columns)
-    logger.info("Completed processing all rows.")
+            multi_event_details[details_string] = None
+    logger.info(
+        f"Multi-event cells: {rule_parsed} parsed by rules, "
+        f"{len(multi_event_details)} left for the OpenAI parser."
+    )
+    return list(multi_event_details)
+
+
+def _parse_multi_event_cells(
+    df, api_key, lecturers, parsed_details, parse_cache, max_concurrency, openai_client
+):
+    """
+    Parse the multi-event cells of df that are not in parsed_details yet.
+
+    Recognizable cells are split locally, the rest goes to OpenAI. The results
+    are added to parsed_details (details_key of the cell -> list of event dicts).
+    """
+    multi_event_details = parse_cells_by_rules(df, lecturers, parsed_details)
+
+    # Parse the remaining multi-event cells concurrently before assembling the rows
+    openai_parsed_details = parse_multi_events(
+        api_key,
+        multi_event_details,
+        cache=parse_cache,
+        max_concurrency=max_concurrency,
+        client=openai_client,
+    )
+    for events in openai_parsed_details.values():
+        lecturers.learn_from_events(events)
+    parsed_details.update(openai_parsed_details)
+
+
+def process_data(
+    df,
+    api_key,
+    parse_cache=None,
+    max_concurrency=MAX_CONCURRENCY,
+    openai_client=None,
+):
+    # Weekly repeats of the same multi-event cell are answered from the cache
+    owns_cache = parse_cache is None
+    if owns_cache:
+        parse_cache = ParseCache()
+
+    try:
+        lecturers = LecturerIndex.load()
+        lecturers.learn_from_dataframe(df)
+        parsed_details = {}
+        _parse_multi_event_cells(
+            df,
+            api_key,
+            lecturers,
+            parsed_details,
+            parse_cache,
+            max_concurrency,
+            openai_client,
+        )
+        lecturers.save()
+
+        processed_df = assemble_events(df, parsed_details)
+        stats = parse_cache.stats()
+        logger.info(
+            f"Completed processing all rows. Parse cache: {stats['hits']} hits, "
+            f"{stats['misses']} misses."
+        )
+    finally:
+        if owns_cache:
+            parse_cache.close()
     return processed_df
 
 
+def iter_events(
+    df,
+    api_key,
+    parse_cache=None,
+    max_concurrency=MAX_CONCURRENCY,
+    openai_client=None,
+    chunk_rows=CHUNK_ROWS,
+):
+    """
+    Streaming variant of process_data: yield TimetableEvent objects chunk by chunk.
+
+    The timetable is processed in chunks of chunk_rows rows, so the first events
+    reach the consumer (e.g. the calendar sync) after the first chunk is parsed
+    and only one chunk of events is held in memory. Parses are shared between
+    chunks, so repeated cells are only parsed once.
+    """
+    owns_cache = parse_cache is None
+    if owns_cache:
+        parse_cache = ParseCache()
+    try:
+        lecturers = LecturerIndex.load()
+        lecturers.learn_from_dataframe(df)
+        parsed_details = {}
+        event_count = 0
+        for chunk_start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[chunk_start : chunk_start + chunk_rows]
+            _parse_multi_event_cells(
+                chunk,
+                api_key,
+                lecturers,
+                parsed_details,
+                parse_cache,
+                max_concurrency,
+                openai_client,
+            )
+            events = events_from_df(assemble_events(chunk, parsed_details))
+            event_count += len(events)
+            yield from events
+        lecturers.save()
+        stats = parse_cache.stats()
+        logger.info(
+            f"Completed processing {event_count} events. Parse cache: "
+            f"{stats['hits']} hits, {stats['misses']} misses."
+        )
+    finally:
+        if owns_cache:
+            parse_cache.close()
+
+
 if __name__ == "__main__":
+    setup_logger()
     secrets = load_secrets()
     pdf_path = "downloads/Stundenplan SoSe_2024_ELM 4.pdf"
     api_key = secrets.get("api_key")
@@ -94,8 +261,8 @@ if __name__ == "__main__":
     events = create_df_from_pdf(pdf_path)
     logger.info("PDF conversion completed. Starting data processing.")
     df_final = process_data(events, api_key)
-    logger.info("Data processing completed. Saving to JSON and CSV.")
-    save_events_to_json(df_final, "output/final_events.json")
+    logger.info("Data processing completed. Saving to JSON Lines and CSV.")
+    save_events_jsonl(events_from_df(df_final), "output/final_events.jsonl")
     save_to_csv(df_final, "output/final_events.csv")
     logger.info("Data saved successfully.")
     print(df_final.head())
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import re
+import threading
+
+from timetable_scraper.libs.timetable_schema import details_lines
+
+logger = logging.getLogger(__name__)
+
+# Names that are known before any timetable has been read (same as the OpenAI prompt)
+SEED_LECTURERS = [
+    "Herth",
+    "Wetter",
+    "Battermann",
+    "P. Wette",
+    "Luhmeyer",
+    "Schünemann",
+    "Simon",
+]
+LECTURER_INDEX_FILE = "cache/lecturers.json"
+MIN_CONFIDENCE = 1.0
+
+# Token types
+COURSE = "course"
+LECTURER = "lecturer"
+ROOM = "room"
+DETAILS = "details"
+
+ROOM_PATTERN = re.compile(
+    r"^(?:[A-Z]{1,2}\s?\d{1,3}[a-z]?|online|Online)"
+    r"(?:\s*[,/+]\s*(?:[A-Z]{1,2}\s?\d{1,3}[a-z]?))*$"
+)
+DETAILS_PATTERN = re.compile(
+    r"^(?:Praktikum|Übung|Ü\b|Tutorium|Labor|Seminar|Vorlesung|Gr\.|Gruppe)"
+    r"|\bGr\.\s*[A-Z0-9]"
+)
+
+########################################################################################
+#                                    LECTURER INDEX                                    #
+########################################################################################
+
+
+def _clean_name(name):
+    return name.strip().rstrip("/,").strip()
+
+
+class LecturerIndex:
+    """Set of known lecturer names, learned from single-event rows and past parses."""
+
+    def __init__(self, names=SEED_LECTURERS):
+        self.names = set()
+        self.add_all(names)
+
+    def add_all(self, names):
+        for name in names:
+            name = _clean_name(name)
+            if name:
+                self.names.add(name)
+
+    def __contains__(self, name):
+        return _clean_name(name) in self.names
+
+    def learn_from_dataframe(self, df):
+        """Single-event cells list the lecturer on their second line."""
+        single_details = df.loc[~df["multi_event"], "raw_details"]
+        self.add_all(details_lines(single_details).str[1].dropna().unique())
+
+    def learn_from_events(self, events):
+        for event in events:
+            if isinstance(event, dict) and isinstance(event.get("lecturer"), list):
+                self.add_all(event["lecturer"])
+
+    @classmethod
+    def load(cls, path=LECTURER_INDEX_FILE):
+        index = cls()
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as file:
+                    index.add_all(json.load(file))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Failed to load lecturer index from {path}: {e}")
+        return index
+
+    def save(self, path=LECTURER_INDEX_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Timetables may be processed concurrently, so replace the file atomically
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(sorted(self.names), file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+########################################################################################
+#                                 TOKENIZE THE DETAILS                                 #
+########################################################################################
+
+
+def classify_line(line, lecturers):
+    """
+    Classify a single line of a details cell.
+
+    Returns:
+    tuple: (token type, cleaned text, certain) where certain is False when the
+    type was only guessed.
+    """
+    text = line.strip()
+    if ROOM_PATTERN.match(text):
+        return ROOM, text, True
+    if DETAILS_PATTERN.search(text):
+        return DETAILS, text, True
+    # "Battermann/" is the lecturer directly followed by the room
+    if text.endswith("/"):
+        return LECTURER, _clean_name(text), True
+    names = [_clean_name(name) for name in text.split(",") if _clean_name(name)]
+    if names and all(name in lecturers for name in names):
+        return LECTURER, ", ".join(names), True
+    return COURSE, text.rstrip(",").strip(), False
+
+
+def tokenize(lines, lecturers):
+    return [classify_line(line, lecturers) for line in lines if line.strip()]
+
+
+########################################################################################
+#                          STATE MACHINE SPLITTING THE EVENTS                          #
+########################################################################################
+
+
+def _new_event():
+    return {"course": "", "lecturer": [], "location": "", "details": ""}
+
+
+def _is_complete(event):
+    return bool(event["course"] and event["location"] and event["lecturer"])
+
+
+def parse_details_lines(lines, lecturers):
+    """
+    Split the lines of a multi-event cell into events.
+
+    Each event follows the pattern: course, lecturer(s), room, optional
+    details, optional trailing lecturer(s).
+
+    Returns:
+    tuple: (list of event dicts, confidence between 0 and 1).
+    """
+    tokens = tokenize(lines, lecturers)
+    if not tokens:
+        return [], 0.0
+
+    events = []
+    event = _new_event()
+    guessed = 0
+    for position, (token_type, text, certain) in enumerate(tokens):
+        if token_type == COURSE:
+            seen_room = bool(event["location"])
+            next_type = tokens[position + 1][0] if position + 1 < len(tokens) else None
+            if seen_room and next_type is None:
+                # A trailing unknown line after the room is most likely a lecturer
+                event["lecturer"].append(text)
+                guessed += 1
+                continue
+            if seen_room:
+                events.append(event)
+                event = _new_event()
+            if event["course"] and not event["lecturer"]:
+                # Course names may wrap onto a second line
+                separator = "" if event["course"].endswith("-") else " "
+                event["course"] += separator + text
+                guessed += 1
+            elif event["course"]:
+                # A course after the lecturer without a room in between
+                guessed += 1
+                events.append(event)
+                event = _new_event()
+                event["course"] = text
+            else:
+                event["course"] = text
+        elif token_type == LECTURER:
+            event["lecturer"].extend(name.strip() for name in text.split(","))
+        elif token_type == ROOM:
+            if event["location"]:
+                guessed += 1
+                event["location"] += ", " + text
+            else:
+                event["location"] = text
+        elif token_type == DETAILS:
+            if event["details"]:
+                event["details"] += ", " + text
+            else:
+                event["details"] = text
+        if not certain and token_type != COURSE:
+            guessed += 1
+    events.append(event)
+
+    if not all(_is_complete(parsed) for parsed in events):
+        return events, 0.0
+    confidence = 1.0 - guessed / len(tokens)
+    return events, confidence
+
+
+def rule_based_parser(lines, lecturers, min_confidence=MIN_CONFIDENCE):
+    """Return the parsed events if the rules are confident enough, otherwise None."""
+    events, confidence = parse_details_lines(lines, lecturers)
+    if confidence >= min_confidence and len(events) > 1:
+        return events
+    return None
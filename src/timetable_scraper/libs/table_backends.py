@@ -0,0 +1,135 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from timetable_scraper.libs.log_config import setup_worker_logger, worker_log_config
+
+logger = logging.getLogger(__name__)
+
+CAMELOT = "camelot"
+PYMUPDF = "pymupdf"
+DEFAULT_BACKEND = CAMELOT
+
+# Each backend returns a list of tables in page order; every table exposes the
+# raw cell grid as `table.df`, which is all convert_tablelist_to_dataframe uses.
+# Backends accept an already opened TimetableDocument to avoid reopening the PDF.
+# PyMuPDF, pandas and Camelot are imported on first use, so choosing a backend
+# (e.g. for the CLI's --backend choices) does not load them.
+
+########################################################################################
+#                      CAMELOT BACKEND (GHOSTSCRIPT + OPENCV LATTICE)                  #
+########################################################################################
+
+
+def _configure_ghostscript():
+    """Make the Homebrew Ghostscript visible to Camelot (macOS)."""
+    homebrew_bin = "/opt/homebrew/bin"
+    if homebrew_bin not in os.environ["PATH"].split(os.pathsep):
+        os.environ["PATH"] = homebrew_bin + os.pathsep + os.environ["PATH"]
+    os.environ["DYLD_LIBRARY_PATH"] = "/opt/homebrew/lib"
+
+
+def _read_pages(pdf_path, pages):
+    # Runs in a worker process and returns the tables of the given page range
+    import camelot
+
+    _configure_ghostscript()
+    return list(camelot.read_pdf(pdf_path, flavor="lattice", pages=pages))
+
+
+def _split_page_ranges(page_count, workers):
+    """Split pages 1..page_count into at most `workers` contiguous ranges."""
+    chunk_size = -(-page_count // workers)  # Ceiling division
+    ranges = []
+    for first_page in range(1, page_count + 1, chunk_size):
+        last_page = min(first_page + chunk_size - 1, page_count)
+        ranges.append(f"{first_page}-{last_page}")
+    return ranges
+
+
+def extract_tables_camelot(pdf_path, workers=1, document=None):
+    """Lattice extraction with Camelot, optionally split across processes by page."""
+    # Camelot always reads the file itself, the document only provides the page count
+    if not workers or workers < 2:
+        return _read_pages(pdf_path, "all")
+    if document is not None:
+        page_count = document.page_count
+    else:
+        import fitz  # PyMuPDF
+
+        with fitz.open(pdf_path) as pdf_document:
+            page_count = pdf_document.page_count
+    if page_count < 2:
+        return _read_pages(pdf_path, "all")
+
+    page_ranges = _split_page_ranges(page_count, workers)
+    logger.info(
+        f"Extracting {page_count} pages in {len(page_ranges)} processes: {page_ranges}"
+    )
+    with ProcessPoolExecutor(
+        max_workers=len(page_ranges),
+        initializer=setup_worker_logger,
+        initargs=worker_log_config(),
+    ) as executor:
+        # map keeps the order of the page ranges, so tables stay in page order
+        chunks = executor.map(_read_pages, [pdf_path] * len(page_ranges), page_ranges)
+        return [table for chunk in chunks for table in chunk]
+
+
+########################################################################################
+#                       PYMUPDF BACKEND (VECTOR-BASED TABLE FINDER)                    #
+########################################################################################
+
+
+class PdfTable:
+    """Table found by PyMuPDF, shaped like a camelot Table for the converter."""
+
+    def __init__(self, df, page):
+        self.df = df
+        self.page = page
+
+
+def extract_tables_pymupdf(pdf_path, workers=1, document=None):
+    """
+    Extract the tables with PyMuPDF's table finder.
+
+    The ruling lines of the timetable are read directly from the PDF's vector
+    graphics, so no rasterization (Ghostscript/OpenCV) is needed. Empty and
+    merged cells become "" like in Camelot's lattice output.
+    """
+    if document is None:
+        import fitz  # PyMuPDF
+
+        with fitz.open(pdf_path) as pdf_document:
+            return _find_tables(pdf_document)
+    return _find_tables(document.document)
+
+
+def _find_tables(pdf_document):
+    import pandas as pd
+
+    tables = []
+    for page in pdf_document:
+        for table in page.find_tables(strategy="lines"):
+            rows = [
+                [cell if cell is not None else "" for cell in row]
+                for row in table.extract()
+            ]
+            tables.append(PdfTable(pd.DataFrame(rows), page.number + 1))
+    return tables
+
+
+TABLE_BACKENDS = {
+    CAMELOT: extract_tables_camelot,
+    PYMUPDF: extract_tables_pymupdf,
+}
+
+
+def get_table_backend(name):
+    try:
+        return TABLE_BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown extraction backend '{name}', choose one of: "
+            f"{', '.join(TABLE_BACKENDS)}"
+        ) from None
@@ -0,0 +1,161 @@
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from timetable_scraper.libs.timetable_schema import (
+    TIMETABLE_FORMAT_VERSION,
+    apply_timetable_schema,
+)
+
+logger = logging.getLogger(__name__)
+
+# Constants for the on-disk timetable cache
+CACHE_DIR = "cache/timetables"
+MAX_CACHE_BYTES = 200 * 1024 * 1024  # 200 MB
+CACHE_FILE_SUFFIX = ".parquet"
+TMP_FILE_SUFFIX = ".tmp"
+# Temporary files older than this are left over from killed writers
+STALE_TMP_SECONDS = 60 * 60
+
+########################################################################################
+#                                  BUILD THE CACHE KEY                                 #
+########################################################################################
+
+
+def build_cache_key(document, backend="camelot"):
+    """
+    Build the cache key from the PDF content hash, the extracted version and the
+    TIMETABLE_FORMAT_VERSION of the cached DataFrame.
+
+    Args:
+    document (TimetableDocument): The opened timetable.
+    backend (str): Extraction backend, different backends are cached separately.
+
+    Returns:
+    str: The cache key, e.g. "<sha256>_20240417T1001_camelot_v2".
+    """
+    version_datetime = document.version
+    version_str = (
+        version_datetime.strftime("%Y%m%dT%H%M") if version_datetime else "noversion"
+    )
+    format_str = f"v{TIMETABLE_FORMAT_VERSION}"
+    return f"{document.content_hash}_{version_str}_{backend}_{format_str}"
+
+
+########################################################################################
+#                                LOAD AND STORE ENTRIES                                #
+########################################################################################
+
+
+def _cache_path(cache_key, cache_dir=CACHE_DIR):
+    return Path(cache_dir) / f"{cache_key}{CACHE_FILE_SUFFIX}"
+
+
+def read_timetable_df(path):
+    """Read a timetable DataFrame written by write_timetable_df."""
+    # Also converts entries written with raw_details as lists of lines
+    return apply_timetable_schema(pd.read_parquet(path))
+
+
+def write_timetable_df(df, path):
+    """Write a timetable DataFrame to a Parquet file, replacing it atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.stem}.", suffix=TMP_FILE_SUFFIX
+    )
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_cached_df(cache_key, cache_dir=CACHE_DIR):
+    """Return the cached DataFrame for the key, or None on a cache miss."""
+    path = _cache_path(cache_key, cache_dir)
+    if not path.exists():
+        logger.info(f"Timetable cache miss: {cache_key}")
+        return None
+    try:
+        df = read_timetable_df(path)
+    except Exception as e:
+        logger.warning(f"Failed to read cache entry {path}, discarding it: {e}")
+        path.unlink(missing_ok=True)
+        return None
+    # Mark the entry as recently used so eviction drops the oldest entries first
+    os.utime(path)
+    logger.info(f"Timetable cache hit: {cache_key}")
+    return df
+
+
+def store_cached_df(df, cache_key, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Write the DataFrame to the cache and evict old entries if needed."""
+    path = _cache_path(cache_key, cache_dir)
+    try:
+        write_timetable_df(df, path)
+        logger.info(f"Stored timetable in cache: {path}")
+    except Exception as e:
+        logger.error(f"Failed to store timetable in cache: {e}")
+        return
+    try:
+        evict_cache(cache_dir, max_bytes)
+    except Exception as e:
+        logger.error(f"Failed to evict timetable cache entries: {e}")
+
+
+########################################################################################
+#                                 EVICTION AND PURGING                                 #
+########################################################################################
+
+
+def evict_cache(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Delete the least recently used entries until the cache fits into max_bytes."""
+    cache_path = Path(cache_dir)
+    if not cache_path.exists():
+        return
+    remove_stale_tmp_files(cache_path)
+    # Entries may disappear at any time through a concurrent eviction
+    entries = []
+    for entry in cache_path.glob(f"*{CACHE_FILE_SUFFIX}"):
+        try:
+            entries.append((entry.stat(), entry))
+        except FileNotFoundError:
+            continue
+    entries.sort(key=lambda item: item[0].st_mtime)
+    total_size = sum(stat.st_size for stat, _ in entries)
+    for stat, entry in entries:
+        if total_size <= max_bytes:
+            break
+        total_size -= stat.st_size
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            continue
+        logger.info(f"Evicted timetable cache entry: {entry.name}")
+
+
+def remove_stale_tmp_files(cache_dir=CACHE_DIR, max_age=STALE_TMP_SECONDS):
+    """Delete temporary files that writers killed mid-write left behind."""
+    cutoff = time.time() - max_age
+    for tmp_file in Path(cache_dir).glob(f".*{TMP_FILE_SUFFIX}"):
+        try:
+            if tmp_file.stat().st_mtime < cutoff:
+                tmp_file.unlink()
+                logger.info(f"Removed stale temporary cache file: {tmp_file.name}")
+        except FileNotFoundError:
+            # Renamed by its writer or removed by a concurrent eviction
+            continue
+
+
+def purge_cache(cache_dir=CACHE_DIR):
+    """Remove all cached timetables."""
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+        logger.info(f"Purged timetable cache at {cache_dir}")
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import re
+from datetime import datetime
+
+import fitz  # PyMuPDF
+from timetable_scraper.libs.table_backends import get_table_backend
+
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = re.compile(r"Version:\s*(\d{2}\.\d{2}\.\d{4}),\s*(\d{2}:\d{2})\s*Uhr")
+_NOT_LOADED = object()
+
+
+def parse_version(text):
+    """
+    Parse the "Version: 17.04.2024, 10:01 Uhr" stamp from the page text.
+
+    Returns:
+    datetime or None: The version as a datetime object, or None if not found.
+    """
+    match = VERSION_PATTERN.search(text)
+    if not match:
+        return None
+    date_version = match.group(1)  # Example: "17.04.2024"
+    time_version = match.group(2)  # Example: "10:01"
+    return datetime.strptime(f"{date_version} {time_version}", "%d.%m.%Y %H:%M")
+
+
+class TimetableDocument:
+    """
+    A timetable PDF that is read and opened only once.
+
+    The file content, its hash, the PyMuPDF document, the page texts, the
+    version and the extracted tables are loaded lazily on first access and
+    shared by all consumers. Use it as a context manager (or call close()) to
+    release the document handle deterministically.
+    """
+
+    def __init__(self, pdf_path):
+        self.pdf_path = str(pdf_path)
+        self._content = None
+        self._content_hash = None
+        self._document = None
+        self._page_texts = {}
+        self._version = _NOT_LOADED
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            with open(self.pdf_path, "rb") as pdf_file:
+                self._content = pdf_file.read()
+        return self._content
+
+    @property
+    def content_hash(self):
+        """SHA-256 hex digest of the PDF's content."""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.content).hexdigest()
+        return self._content_hash
+
+    @property
+    def document(self):
+        # Opened from the bytes already read for hashing, so the file is read once
+        if self._document is None:
+            self._document = fitz.open(stream=self.content, filetype="pdf")
+        return self._document
+
+    @property
+    def page_count(self):
+        return self.document.page_count
+
+    def page_text(self, page_number=0):
+        if page_number not in self._page_texts:
+            self._page_texts[page_number] = self.document[page_number].get_text()
+        return self._page_texts[page_number]
+
+    @property
+    def version(self):
+        """The "Version:" datetime from the first page, or None if not found."""
+        if self._version is _NOT_LOADED:
+            logger.info(f"Starting to extract version from: {self.pdf_path}")
+            try:
+                self._version = parse_version(self.page_text(0))
+            except Exception as e:
+                logger.error(f"Failed to extract version due to an error: {e}")
+                self._version = None
+            if self._version:
+                logger.info(f"Extracted version: {self._version}")
+            else:
+                logger.warning("Version not found in the PDF.")
+        return self._version
+
+    @property
+    def year(self):
+        return self.version.year if self.version else None
+
+    def tables(self, backend, workers=1):
+        """Tables extracted with the given backend, cached per backend."""
+        if backend not in self._tables:
+            self._tables[backend] = get_table_backend(backend)(
+                self.pdf_path, workers=workers, document=self
+            )
+        return self._tables[backend]
@@ -0,0 +1,354 @@
+import collections
+import functools
+import json
+import logging
+import os
+import struct
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+
+logger = logging.getLogger(__name__)
+
+# Binary format: header (magic, format version, event count), then per event the
+# date as proleptic ordinal, start and end as seconds of the day, the number of
+# lecturers and the length-prefixed UTF-8 strings.
+BINARY_MAGIC = b"TTEV"
+BINARY_VERSION = 1
+# Events files with this suffix are written in the binary format
+BINARY_EVENTS_SUFFIX = ".ttev"
+_HEADER = struct.Struct("<4sBI")
+_FIXED_FIELDS = struct.Struct("<IIIH")
+_STRING_LENGTH = struct.Struct("<I")
+_MAX_ORDINAL = date.max.toordinal()
+
+########################################################################################
+#                                     EVENT MODEL                                      #
+########################################################################################
+
+
+@dataclass(frozen=True, slots=True)
+class TimetableEvent:
+    """One calendar event of the timetable, as produced by process_data."""
+
+    date: date
+    start_time: time
+    end_time: time
+    course: str
+    lecturer: tuple[str, ...] = ()
+    location: str = ""
+    details: str = ""
+
+    def to_dict(self):
+        """JSON-compatible dict with ISO dates and times."""
+        return {
+            "date": self.date.isoformat(),
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat(),
+            "course": self.course,
+            "lecturer": list(self.lecturer),
+            "location": self.location,
+            "details": self.details,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build an event from to_dict output or from a legacy events JSON record.
+
+        Legacy records (written with DataFrame.to_json) store the date as epoch
+        milliseconds and may contain the lecturer list as a string.
+        """
+        return cls(
+            date=_to_date(data["date"]),
+            start_time=_to_time(data["start_time"]),
+            end_time=_to_time(data["end_time"]),
+            course=data.get("course") or "",
+            lecturer=_to_lecturers(data.get("lecturer")),
+            location=data.get("location") or "",
+            details=data.get("details") or "",
+        )
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line):
+        return cls.from_dict(json.loads(line))
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)):
+        # DataFrame.to_json writes dates as epoch milliseconds (UTC midnight)
+        return datetime.fromtimestamp(value / 1000, timezone.utc).date()
+    return date.fromisoformat(value)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_time(value):
+    # A timetable only has a handful of distinct times
+    return time.fromisoformat(value)
+
+
+def _to_time(value):
+    if isinstance(value, time):
+        return value
+    return _parse_time(value)
+
+
+def _to_lecturers(value):
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        value = _load_lecturers(value)
+        if isinstance(value, str):
+            return (value,)
+    return tuple(str(lecturer) for lecturer in value)
+
+
+def _load_lecturers(text):
+    # JSON from encode_lecturers, or a Python list repr from legacy records
+    for candidate in (text, text.replace("'", '"')):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            pass
+    return text
+
+
+def encode_lecturers(value):
+    """
+    Encode a lecturer list as a JSON string.
+
+    Unlike lists, the strings are hashable, so the lecturer column of the
+    events DataFrame can be a categorical; events_from_df decodes them again.
+    """
+    return json.dumps(list(_to_lecturers(value)), ensure_ascii=False)
+
+
+########################################################################################
+#                                 DATAFRAME CONVERSION                                 #
+########################################################################################
+
+
+def events_from_df(df):
+    """
+    Convert the processed events DataFrame into TimetableEvent objects.
+
+    Rows without a parsed date are skipped with a warning.
+
+    Returns:
+    list[TimetableEvent]: The events in DataFrame order.
+    """
+    valid = df["date"].notna()
+    if not valid.all():
+        logger.warning(f"Skipping {int((~valid).sum())} event(s) without a date.")
+        df = df[valid]
+    rows = zip(
+        df["date"].dt.date,
+        df["start_time"],
+        df["end_time"],
+        df["course"],
+        _lecturer_tuples(df["lecturer"]),
+        df["location"],
+        df["details"],
+    )
+    return [
+        TimetableEvent(day, start, end, course, lecturer, location, details or "")
+        for day, start, end, course, lecturer, location, details in rows
+    ]
+
+
+def _lecturer_tuples(lecturers):
+    if lecturers.dtype.name != "category":
+        return [_to_lecturers(lecturer) for lecturer in lecturers]
+    # Decode each category once, missing values (code -1) have no lecturer
+    decoded = [_to_lecturers(lecturer) for lecturer in lecturers.cat.categories]
+    decoded.append(())
+    return [decoded[code] for code in lecturers.cat.codes]
+
+
+########################################################################################
+#                                        CODECS                                        #
+########################################################################################
+
+
+def encode_jsonl(events):
+    """Yield one JSON line (with trailing newline) per event."""
+    for event in events:
+        yield event.to_json() + "\n"
+
+
+def decode_jsonl(lines):
+    """Yield the events of JSON lines, skipping blank lines."""
+    for line in lines:
+        if line.strip():
+            yield TimetableEvent.from_json(line)
+
+
+class EventsJsonlWriter:
+    """
+    Context manager writing events to a JSON Lines file one by one.
+
+    The lines go to a temporary file that replaces output_path when the block
+    exits without an exception; otherwise the previous file is kept. Each
+    writer has its own temporary file, so pipelines writing the same events
+    file (one PDF feeding two calendars) do not interfere.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        output_dir = os.path.dirname(self.output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self._file = open(self.tmp_path, "w", encoding="utf-8")
+        return self
+
+    def write(self, event):
+        self._file.write(event.to_json() + "\n")
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._file.close()
+        if exc_type is not None:
+            os.remove(self.tmp_path)
+            return False
+        os.replace(self.tmp_path, self.output_path)
+        logger.info(f"Saved {self.count} events to {self.output_path}")
+        return False
+
+
+def write_events_jsonl(events, output_path):
+    """
+    Yield the events while writing them to a JSON Lines file.
+
+    The consumer drives the writing, so the events can be synced while they are
+    still being produced. The file is only replaced once all events have
+    passed; if the consumer stops early (GeneratorExit) or fails, the previous
+    file is kept.
+    """
+    with EventsJsonlWriter(output_path) as writer:
+        for event in events:
+            writer.write(event)
+            yield event
+
+
+def save_events_jsonl(events, output_path):
+    """Write the events to a JSON Lines file."""
+    collections.deque(write_events_jsonl(events, output_path), maxlen=0)
+
+
+def _seconds_of_day(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _time_from_seconds(seconds):
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def encode_binary(events):
+    """Pack the events into the compact binary format."""
+    events = list(events)
+    parts = [_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(events))]
+    for event in events:
+        parts.append(
+            _FIXED_FIELDS.pack(
+                event.date.toordinal(),
+                _seconds_of_day(event.start_time),
+                _seconds_of_day(event.end_time),
+                len(event.lecturer),
+            )
+        )
+        for text in (event.course, *event.lecturer, event.location, event.details):
+            encoded = text.encode("utf-8")
+            parts.append(_STRING_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+    return b"".join(parts)
+
+
+def decode_binary(data):
+    """
+    Unpack events written by encode_binary.
+
+    Raises:
+    ValueError: If data is not in the binary event format, truncated or
+    corrupted.
+    """
+    view = memoryview(data)
+    offset = 0
+
+    def read(size):
+        nonlocal offset
+        if offset + size > len(view):
+            raise ValueError(f"Truncated timetable event data at byte {offset}.")
+        chunk = view[offset : offset + size]
+        offset += size
+        return chunk
+
+    def read_string():
+        (length,) = _STRING_LENGTH.unpack(read(_STRING_LENGTH.size))
+        # UnicodeDecodeError is a ValueError as well
+        return str(read(length), "utf-8")
+
+    magic, version, count = _HEADER.unpack(read(_HEADER.size))
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"Not a timetable event file (version {version}).")
+
+    events = []
+    for _ in range(count):
+        ordinal, start, end, lecturer_count = _FIXED_FIELDS.unpack(
+            read(_FIXED_FIELDS.size)
+        )
+        if not 1 <= ordinal <= _MAX_ORDINAL or max(start, end) >= 24 * 3600:
+            raise ValueError("Invalid date or time in timetable event data.")
+        course = read_string()
+        lecturer = tuple(read_string() for _ in range(lecturer_count))
+        events.append(
+            TimetableEvent(
+                date=date.fromordinal(ordinal),
+                start_time=_time_from_seconds(start),
+                end_time=_time_from_seconds(end),
+                course=course,
+                lecturer=lecturer,
+                location=read_string(),
+                details=read_string(),
+            )
+        )
+    if offset != len(view):
+        raise ValueError(f"Unexpected data after {count} timetable events.")
+    return events
+
+
+def save_events_binary(events, output_path):
+    """Write the events to a file in the binary format, replacing it atomically."""
+    data = encode_binary(events)
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logger.info(f"Saved {len(data)} bytes of events to {output_path}")
+
+
+def save_events(events, output_path):
+    """Write the events as JSON Lines, or binary for BINARY_EVENTS_SUFFIX paths."""
+    if str(output_path).endswith(BINARY_EVENTS_SUFFIX):
+        save_events_binary(events, output_path)
+    else:
+        save_events_jsonl(events, output_path)
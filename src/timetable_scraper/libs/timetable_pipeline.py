@@ -0,0 +1,361 @@
+import contextlib
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from timetable_scraper.libs.openai_cache import ParseCache
+from timetable_scraper.libs.openai_parser import MAX_CONCURRENCY, parse_multi_events
+from timetable_scraper.libs.process_raw_data import (
+    assemble_events,
+    parse_cells_by_rules,
+)
+from timetable_scraper.libs.rule_based_parser import LecturerIndex
+from timetable_scraper.libs.timetable_event import EventsJsonlWriter, events_from_df
+from timetable_scraper.libs.timetable_schema import details_keys
+
+logger = logging.getLogger(__name__)
+
+# Small chunks let the first events reach the sync early and spread the
+# OpenAI requests over the workers
+CHUNK_ROWS = 100
+# Chunks of events buffered between two stages before the producer blocks
+QUEUE_SIZE = 8
+# Threads sending multi-event cells to OpenAI, each with MAX_CONCURRENCY requests
+OPENAI_WORKERS = 2
+# How often blocked stages check whether another stage failed
+POLL_SECONDS = 0.1
+
+_DONE = object()
+
+########################################################################################
+#                                       CHANNELS                                       #
+########################################################################################
+
+
+class Channel:
+    """
+    Bounded queue connecting pipeline stages.
+
+    put() blocks while the channel is full, so a slow consumer slows down its
+    producers instead of letting the events pile up. Iterating yields the items
+    until all producers have called close(); several consumers may iterate the
+    same channel. After cancel(error), blocked and later put() calls and the
+    iterators raise error, so a failing stage stops the whole pipeline.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE, producers=1):
+        self._queue = queue.Queue(maxsize)
+        self._open_producers = producers
+        self._lock = threading.Lock()
+        self._error = None
+
+    def _raise_if_cancelled(self):
+        if self._error is not None:
+            raise self._error
+
+    def put(self, item):
+        while True:
+            self._raise_if_cancelled()
+            try:
+                self._queue.put(item, timeout=POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+
+    def close(self):
+        """Mark one producer as finished."""
+        with self._lock:
+            self._open_producers -= 1
+            finished = self._open_producers == 0
+        if finished:
+            self.put(_DONE)
+
+    def cancel(self, error):
+        if self._error is None:
+            self._error = error
+
+    def __iter__(self):
+        while True:
+            self._raise_if_cancelled()
+            try:
+                item = self._queue.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                # Leave the marker for the other consumers
+                self._queue.put(_DONE)
+                return
+            yield item
+
+
+class _InFlightParses:
+    """
+    Multi-event cells requested from OpenAI by any worker.
+
+    A cell repeating weekly reaches the workers in several chunks. The first
+    worker claims it and sends the request; the others wait for its result
+    instead of paying for the same request before it is in the ParseCache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = {}
+        self._parsed = {}
+
+    def claim(self, details_strings):
+        """Return the details strings the calling worker has to request."""
+        claimed = []
+        with self._lock:
+            for details_string in details_strings:
+                if details_string not in self._done:
+                    self._done[details_string] = threading.Event()
+                    claimed.append(details_string)
+        return claimed
+
+    def publish(self, claimed, parsed_details):
+        # Cells without a result have no events, like missing parses in process_data
+        with self._lock:
+            for details_string in claimed:
+                self._parsed[details_string] = parsed_details.get(details_string, [])
+        for details_string in claimed:
+            self._done[details_string].set()
+
+    def wait(self, details_strings, channel):
+        """
+        Return the parsed events of the details strings once all are published.
+
+        Raises the error of channel if the pipeline is cancelled meanwhile,
+        e.g. because the worker that claimed a cell failed.
+        """
+        for details_string in details_strings:
+            while not self._done[details_string].wait(POLL_SECONDS):
+                channel._raise_if_cancelled()
+        with self._lock:
+            return {
+                details_string: self._parsed[details_string]
+                for details_string in details_strings
+            }
+
+
+########################################################################################
+#                                        STAGES                                        #
+########################################################################################
+
+
+def _split_stage(timetables, lecturers, to_sync, to_openai, chunk_rows, stats):
+    """
+    Turn single-event rows and rule-parsable cells into events right away.
+
+    Rows whose cells need the OpenAI parser are sent to the OpenAI stage.
+    """
+    parsed_details = {}
+    for pdf_path, timetable_df in timetables:
+        lecturers.learn_from_dataframe(timetable_df)
+        for chunk_start in range(0, len(timetable_df), chunk_rows):
+            chunk = timetable_df.iloc[chunk_start : chunk_start + chunk_rows]
+            openai_details = parse_cells_by_rules(chunk, lecturers, parsed_details)
+            details_strings = details_keys(chunk["raw_details"])
+            multi_event = chunk["multi_event"].astype(bool)
+            waiting = multi_event & details_strings.isin(openai_details)
+            ready_events = events_from_df(
+                assemble_events(chunk[~waiting], parsed_details)
+            )
+            stats.add("direct_events", len(ready_events))
+            if ready_events:
+                to_sync.put((pdf_path, ready_events))
+            if waiting.any():
+                stats.add("openai_rows", int(waiting.sum()))
+                to_openai.put((pdf_path, chunk[waiting]))
+
+
+def _openai_stage(
+    to_openai,
+    to_sync,
+    api_key,
+    lecturers,
+    parse_cache,
+    max_concurrency,
+    openai_client,
+    in_flight,
+    stats,
+):
+    """Parse the waiting multi-event rows with OpenAI and pass their events on."""
+    for pdf_path, rows in to_openai:
+        details_strings = list(dict.fromkeys(details_keys(rows["raw_details"])))
+        claimed = in_flight.claim(details_strings)
+        if claimed:
+            stats.add("openai_cells", len(claimed))
+            parsed_details = parse_multi_events(
+                api_key,
+                claimed,
+                cache=parse_cache,
+                max_concurrency=max_concurrency,
+                client=openai_client,
+            )
+            for events in parsed_details.values():
+                lecturers.learn_from_events(events)
+            in_flight.publish(claimed, parsed_details)
+        parsed_details = in_flight.wait(details_strings, to_sync)
+        events = events_from_df(assemble_events(rows, parsed_details))
+        stats.add("openai_events", len(events))
+        to_sync.put((pdf_path, events))
+
+
+def _run_stage(stage, outputs, channels, *args):
+    # A failing stage cancels every channel, which stops the other stages
+    try:
+        stage(*args)
+    except BaseException as e:
+        for channel in channels:
+            channel.cancel(e)
+        raise
+    for output in outputs:
+        output.close()
+
+
+class _Stats:
+    """Event counters shared by the stage threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            "direct_events": 0,
+            "openai_rows": 0,
+            "openai_cells": 0,
+            "openai_events": 0,
+        }
+
+    def add(self, name, count):
+        with self._lock:
+            self.counts[name] += count
+
+
+def events_file_for(pdf_path, output_dir):
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(output_dir, f"{stem}_events.jsonl")
+
+
+########################################################################################
+#                                    ENTRY FUNCTION                                    #
+########################################################################################
+
+
+def run_calendar_pipeline(
+    timetables,
+    api_key,
+    sync,
+    output_dir="output",
+    parse_cache=None,
+    openai_workers=OPENAI_WORKERS,
+    max_concurrency=MAX_CONCURRENCY,
+    queue_size=QUEUE_SIZE,
+    chunk_rows=CHUNK_ROWS,
+    openai_client=None,
+):
+    """
+    Parse and sync the timetables of one calendar as a pipeline of stages.
+
+    - split (one thread): reads the timetables chunk by chunk. Single-event rows
+      and cells the rule-based parser can split become events immediately and
+      go straight to the sync stage; the other rows go to the OpenAI stage.
+    - openai (openai_workers threads): parses the waiting rows. Each distinct
+      cell is requested by one worker only, the others wait for its result.
+    - sync (the calling thread): passes the events to sync and writes them to
+      one <pdf name>_events.jsonl file per timetable.
+
+    The stages are connected by bounded channels. A slow stage therefore blocks
+    its producers (backpressure), and the end-to-end time approaches that of
+    the slowest stage. Events from OpenAI arrive after the direct events, so
+    the files are not in timetable order. A failure in any stage stops the
+    others and is raised from the event stream, i.e. before sync_events
+    deletes anything.
+
+    Args:
+    timetables (iterable): (pdf_path, timetable_df) tuples, e.g. a Channel fed
+    while further PDFs are still being extracted.
+    sync (callable): Consumes an iterable of TimetableEvent objects and returns
+    the sync result, e.g. a partial of sync_events.
+
+    Returns:
+    The result of sync.
+    """
+    owns_cache = parse_cache is None
+    if owns_cache:
+        parse_cache = ParseCache()
+    lecturers = LecturerIndex.load()
+    stats = _Stats()
+    in_flight = _InFlightParses()
+    to_openai = Channel(queue_size)
+    # Closed by the split stage and by every OpenAI worker
+    to_sync = Channel(queue_size, producers=1 + openai_workers)
+    channels = (to_openai, to_sync)
+
+    def event_stream(stack):
+        writers = {}
+        for pdf_path, events in to_sync:
+            writer = writers.get(pdf_path)
+            if writer is None:
+                writer = writers[pdf_path] = stack.enter_context(
+                    EventsJsonlWriter(events_file_for(pdf_path, output_dir))
+                )
+            for event in events:
+                writer.write(event)
+                yield event
+
+    executor = ThreadPoolExecutor(1 + openai_workers, thread_name_prefix="pipeline")
+    try:
+        stage_futures = [
+            executor.submit(
+                _run_stage,
+                _split_stage,
+                (to_openai, to_sync),
+                channels,
+                timetables,
+                lecturers,
+                to_sync,
+                to_openai,
+                chunk_rows,
+                stats,
+            )
+        ]
+        for _ in range(openai_workers):
+            stage_futures.append(
+                executor.submit(
+                    _run_stage,
+                    _openai_stage,
+                    (to_sync,),
+                    channels,
+                    to_openai,
+                    to_sync,
+                    api_key,
+                    lecturers,
+                    parse_cache,
+                    max_concurrency,
+                    openai_client,
+                    in_flight,
+                    stats,
+                )
+            )
+        with contextlib.ExitStack() as stack:
+            try:
+                result = sync(event_stream(stack))
+            except BaseException as e:
+                for channel in channels:
+                    channel.cancel(e)
+                raise
+        for future in stage_futures:
+            future.result()
+    finally:
+        executor.shutdown(wait=True)
+        if owns_cache:
+            parse_cache.close()
+    lecturers.save()
+    counts = stats.counts
+    logger.info(
+        f"Pipeline finished: {counts['direct_events']} events synced directly, "
+        f"{counts['openai_events']} from {counts['openai_rows']} rows parsed by OpenAI "
+        f"({counts['openai_cells']} distinct cells)."
+    )
+    return result
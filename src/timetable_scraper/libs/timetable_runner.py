@@ -0,0 +1,272 @@
+import glob
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from timetable_scraper.libs.camelot_raw_pdf_to_df import create_df_from_pdf
+from timetable_scraper.libs.log_config import setup_worker_logger, worker_log_config
+from timetable_scraper.libs.metrics import metrics
+from timetable_scraper.libs.table_backends import DEFAULT_BACKEND
+from timetable_scraper.libs.timetable_pipeline import Channel, run_calendar_pipeline
+from timetable_scraper.libs.update_timetable_google_api import (
+    GoogleCalendarAPI,
+    create_all_events,
+    save_events_to_csv,
+    sync_events,
+)
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = "output"
+DOWNLOADS_DIR = "downloads"
+
+########################################################################################
+#                          MAP THE TIMETABLES TO THEIR CALENDARS                       #
+########################################################################################
+
+
+def resolve_timetable_jobs(timetables_config, downloads_dir=DOWNLOADS_DIR):
+    """
+    Expand the `timetables` section of the secrets into one job per PDF.
+
+    Each entry maps a PDF path or glob pattern (relative to downloads_dir unless
+    absolute) to a calendar id, e.g.
+
+        timetables:
+          - pdf: "Stundenplan *_ELM 2.pdf"
+            calendar_id: "...@group.calendar.google.com"
+
+    Returns:
+    list[dict]: Jobs with the keys "pdf" and "calendar_id".
+    """
+    jobs = []
+    for entry in timetables_config or []:
+        pattern = entry["pdf"]
+        if not os.path.isabs(pattern) and not os.path.exists(pattern):
+            pattern = os.path.join(downloads_dir, pattern)
+        pdf_paths = sorted(glob.glob(pattern)) or [pattern]
+        for pdf_path in pdf_paths:
+            jobs.append({"pdf": pdf_path, "calendar_id": entry["calendar_id"]})
+    return jobs
+
+
+def select_changed_jobs(jobs, changed_pdfs):
+    """
+    Keep the jobs of every calendar that has at least one changed PDF.
+
+    All timetables of an affected calendar are kept, because syncing only the
+    changed one would delete the events of the others.
+
+    Returns:
+    list[dict]: The selected jobs.
+    """
+    changed = {os.path.abspath(pdf_path) for pdf_path in changed_pdfs}
+    affected_calendars = {
+        job["calendar_id"] for job in jobs if os.path.abspath(job["pdf"]) in changed
+    }
+    return [job for job in jobs if job["calendar_id"] in affected_calendars]
+
+
+def dry_run_file_for(calendar_id, output_dir=OUTPUT_DIR):
+    """
+    CSV file of the prepared events of a dry run.
+
+    Without a calendar id (the single-timetable default) this is the same
+    dry_run_output.csv as before; otherwise a hash of the id keeps the files
+    of several calendars apart without putting the id into the file name.
+    """
+    if not calendar_id:
+        return os.path.join(output_dir, "dry_run_output.csv")
+    calendar_hash = hashlib.sha1(calendar_id.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(output_dir, f"dry_run_output_{calendar_hash}.csv")
+
+
+########################################################################################
+#                                  PIPELINE STAGES                                     #
+########################################################################################
+
+
+def _extract_timetable(pdf_path, use_cache, extract_workers, backend):
+    # Runs in a worker process: Camelot/Ghostscript are CPU-bound and hold the GIL.
+    # The worker's metrics are sent back with the result and merged by the parent.
+    metrics.reset()
+    timetable_df = create_df_from_pdf(
+        pdf_path, use_cache=use_cache, extract_workers=extract_workers, backend=backend
+    )
+    return timetable_df, metrics.snapshot()
+
+
+def _parse_and_sync(calendar_api, timetables, api_key, dry_run):
+    """
+    Parse the timetables of one calendar and sync them in a single pass.
+
+    The events are streamed through run_calendar_pipeline: the sync consumes
+    them while the timetables are still being parsed, and each timetable's
+    events are written to its <stem>_events.jsonl file on the way.
+    """
+
+    def sync(local_events):
+        if dry_run:
+            created_events = create_all_events(calendar_api, local_events)
+            save_events_to_csv(
+                created_events, dry_run_file_for(calendar_api.calendar_id)
+            )
+            return {"inserted": len(created_events)}
+        return sync_events(calendar_api, local_events, batch=True)
+
+    return run_calendar_pipeline(timetables, api_key, sync, output_dir=OUTPUT_DIR)
+
+
+########################################################################################
+#                                    ENTRY FUNCTION                                    #
+########################################################################################
+
+
+def run_timetables(
+    jobs,
+    api_key,
+    time_zone,
+    dry_run=True,
+    use_cache=True,
+    max_processes=None,
+    max_threads=None,
+    extract_workers=1,
+    backend=DEFAULT_BACKEND,
+):
+    """
+    Extract, parse and sync several timetables in parallel.
+
+    Each distinct PDF is extracted once in a process pool, also when it feeds
+    several calendars. The first extracted PDF of a calendar starts that
+    calendar's parse and sync pipeline in a thread pool; further PDFs of the
+    calendar are fed into the running pipeline as they finish.
+    Each calendar is handled by exactly one pipeline, and a failure only marks
+    the timetables of the affected calendar as failed.
+
+    Returns:
+    list[dict]: One summary per job with pdf, calendar_id, status, rows,
+    sync counts and error.
+    """
+    # Keyed by calendar and PDF, one PDF may feed several calendars
+    summaries = {
+        (job["calendar_id"], job["pdf"]): {
+            "pdf": job["pdf"],
+            "calendar_id": job["calendar_id"],
+            "status": "pending",
+            "rows": 0,
+            "sync": {},
+            "error": None,
+        }
+        for job in jobs
+    }
+    pending_by_calendar = {}
+    # Each PDF is extracted once and fed to every calendar that uses it
+    calendars_by_pdf = {}
+    for job in jobs:
+        pending_by_calendar.setdefault(job["calendar_id"], set()).add(job["pdf"])
+        calendars = calendars_by_pdf.setdefault(job["pdf"], [])
+        if job["calendar_id"] not in calendars:
+            calendars.append(job["calendar_id"])
+    fed_by_calendar = {calendar_id: [] for calendar_id in pending_by_calendar}
+    # calendar_id -> (stage, error) for the timetables that are not synced
+    failed_calendars = {}
+    feeds = {}
+    sync_futures = {}
+
+    def fail(calendar_id, pdf_paths, stage, error):
+        for pdf_path in pdf_paths:
+            summaries[calendar_id, pdf_path]["status"] = f"failed ({stage})"
+            summaries[calendar_id, pdf_path]["error"] = str(error)
+
+    def extraction_failed(calendar_id, pdf_path, error):
+        fail(calendar_id, [pdf_path], "extract", error)
+        if calendar_id not in failed_calendars:
+            # Syncing a subset of the timetables would delete the missing
+            # events, so a running pipeline is stopped before it deletes
+            message = "another timetable of this calendar failed to extract"
+            failed_calendars[calendar_id] = ("skipped", message)
+            if calendar_id in feeds:
+                feeds[calendar_id].cancel(RuntimeError(message))
+
+    def feed(calendar_id, pdf_path, timetable_df, thread_pool):
+        if calendar_id in failed_calendars:
+            fail(calendar_id, [pdf_path], *failed_calendars[calendar_id])
+            return
+        if calendar_id not in feeds:
+            try:
+                # Authenticate in the main thread, the OAuth flow is not
+                # thread-safe
+                calendar_api = GoogleCalendarAPI(calendar_id, time_zone, dry_run)
+            except Exception as e:
+                logger.error(f"Failed to set up calendar {calendar_id}: {e}")
+                failed_calendars[calendar_id] = ("auth", e)
+                fail(calendar_id, [pdf_path], "auth", e)
+                return
+            # Unbounded: the main thread must never block on a slow pipeline
+            feeds[calendar_id] = Channel(maxsize=0)
+            sync_future = thread_pool.submit(
+                _parse_and_sync,
+                calendar_api,
+                feeds[calendar_id],
+                api_key,
+                dry_run,
+            )
+            sync_futures[sync_future] = calendar_id
+        feeds[calendar_id].put((pdf_path, timetable_df))
+        fed_by_calendar[calendar_id].append(pdf_path)
+        if not pending_by_calendar[calendar_id]:
+            feeds[calendar_id].close()
+
+    # Workers send their log records to this process, which writes the log file
+    with ProcessPoolExecutor(
+        max_processes,
+        initializer=setup_worker_logger,
+        initargs=worker_log_config(),
+    ) as process_pool, ThreadPoolExecutor(max_threads) as thread_pool:
+        extract_futures = {
+            process_pool.submit(
+                _extract_timetable, pdf_path, use_cache, extract_workers, backend
+            ): pdf_path
+            for pdf_path in calendars_by_pdf
+        }
+        for future in as_completed(extract_futures):
+            pdf_path = extract_futures[future]
+            calendar_ids = calendars_by_pdf[pdf_path]
+            for calendar_id in calendar_ids:
+                pending_by_calendar[calendar_id].discard(pdf_path)
+            try:
+                timetable_df, worker_metrics = future.result()
+                metrics.merge(worker_metrics)
+            except Exception as e:
+                logger.error(f"Failed to extract {pdf_path}: {e}")
+                for calendar_id in calendar_ids:
+                    extraction_failed(calendar_id, pdf_path, e)
+                continue
+            for calendar_id in calendar_ids:
+                summaries[calendar_id, pdf_path]["rows"] = len(timetable_df)
+                feed(calendar_id, pdf_path, timetable_df, thread_pool)
+
+        for future in as_completed(sync_futures):
+            calendar_id = sync_futures[future]
+            pdf_paths = fed_by_calendar[calendar_id]
+            try:
+                counts = future.result()
+            except Exception as e:
+                if calendar_id in failed_calendars:
+                    fail(calendar_id, pdf_paths, *failed_calendars[calendar_id])
+                else:
+                    logger.error(f"Failed to sync calendar {calendar_id}: {e}")
+                    fail(calendar_id, pdf_paths, "sync", e)
+                continue
+            for pdf_path in pdf_paths:
+                summaries[calendar_id, pdf_path]["sync"] = counts
+                summaries[calendar_id, pdf_path]["status"] = "ok"
+
+    results = [summaries[job["calendar_id"], job["pdf"]] for job in jobs]
+    for summary in results:
+        logger.info(
+            f"{summary['pdf']}: {summary['status']}, {summary['rows']} rows, "
+            f"sync {summary['sync']}"
+        )
+    return results
@@ -0,0 +1,98 @@
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# The text of each timetable cell, lines separated by LINE_SEPARATOR. Arrow
+# strings keep all cells in one contiguous UTF-8 buffer with an offset per row
+# instead of a Python list of line strings per row.
+DETAILS_DTYPE = pd.StringDtype("pyarrow")
+LINE_SEPARATOR = "\n"
+# A single event lists course, lecturer, location and details; cells with more
+# lines hold several events
+SINGLE_EVENT_LINES = 4
+
+# Melted timetable as returned by create_df_from_pdf
+TIMETABLE_COLUMNS = ["date", "start_time", "end_time", "raw_details", "multi_event"]
+# Part of the timetable cache key: bump it whenever the extraction, the melt or
+# the schema give different timetables, so older cache entries are not used
+TIMETABLE_FORMAT_VERSION = 2
+# Columns with few distinct values, stored as codes into their categories
+TIMETABLE_CATEGORIES = ["start_time", "end_time"]
+EVENTS_CATEGORIES = ["start_time", "end_time", "course", "lecturer", "location"]
+
+########################################################################################
+#                                     RAW DETAILS                                      #
+########################################################################################
+
+
+def details_lines(raw_details):
+    """Split the cells into lists of lines, e.g. for one chunk of rows."""
+    return raw_details.str.split(LINE_SEPARATOR)
+
+
+def details_key(text):
+    """
+    The details string of a cell, as used by the parsers and the parse cache.
+
+    Equal to joining the lines of the cell with ", ".
+    """
+    return text.replace(LINE_SEPARATOR, ", ")
+
+
+def details_keys(raw_details):
+    """Vectorized details_key for a column of cells."""
+    return raw_details.str.replace(LINE_SEPARATOR, ", ", regex=False)
+
+
+def count_lines(raw_details):
+    # Literal replace and length run in Arrow compute, str.count would use a regex
+    without_separators = raw_details.str.replace(LINE_SEPARATOR, "", regex=False)
+    return raw_details.str.len() - without_separators.str.len() + 1
+
+
+def is_multi_event(raw_details):
+    """True for the cells listing more lines than a single event has."""
+    multi_event = count_lines(raw_details) > SINGLE_EVENT_LINES
+    return multi_event.fillna(False).astype(bool)
+
+
+def _join_lines(value):
+    # Cache entries written before the flat schema hold a list (array) of lines
+    if value is None or isinstance(value, str):
+        return value
+    return LINE_SEPARATOR.join(value)
+
+
+########################################################################################
+#                                     SCHEMA CASTS                                     #
+########################################################################################
+
+
+def _as_categories(df, columns):
+    for column in columns:
+        if column not in df.columns:
+            continue
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
+
+
+def apply_timetable_schema(df):
+    """
+    Cast a melted timetable to the TIMETABLE_COLUMNS schema.
+
+    raw_details becomes DETAILS_DTYPE and the times categoricals. Timetables
+    with raw_details as lists of lines (older cache entries) are converted too.
+    """
+    raw_details = df["raw_details"]
+    if not isinstance(raw_details.dtype, pd.StringDtype):
+        raw_details = raw_details.map(_join_lines, na_action="ignore")
+    df["raw_details"] = raw_details.astype(DETAILS_DTYPE)
+    return _as_categories(df, TIMETABLE_CATEGORIES)
+
+
+def apply_events_schema(df):
+    """Store the repeated fields of the events as categoricals."""
+    return _as_categories(df, EVENTS_CATEGORIES)
@@ -0,0 +1,146 @@
+import logging
+import os
+import random
+import signal
+import threading
+
+from timetable_scraper.libs.download_timetables import sync_timetables
+from timetable_scraper.libs.get_timetable_ver import (
+    VERSION_LOG_FILE,
+    append_version_log,
+    extract_version,
+    read_version_log,
+)
+from timetable_scraper.libs.metrics import METRICS_FILE, metrics
+from timetable_scraper.libs.timetable_runner import (
+    resolve_timetable_jobs,
+    run_timetables,
+    select_changed_jobs,
+)
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 15 * 60
+# Each delay is randomized by up to +/-10% so several watchers do not poll in lockstep
+POLL_JITTER = 0.1
+
+
+def next_poll_delay(interval=POLL_INTERVAL_SECONDS, jitter=POLL_JITTER):
+    return max(0.0, interval * (1 + random.uniform(-jitter, jitter)))
+
+
+def find_new_versions(jobs, logged_versions, downloaded_pdfs=()):
+    """
+    Compare the "Version:" stamp of each timetable with the version log.
+
+    A PDF without a version stamp counts as new only if it was just downloaded.
+
+    Returns:
+    dict: PDF path -> version datetime (or None) of the timetables that changed.
+    """
+    downloaded = {os.path.abspath(pdf_path) for pdf_path in downloaded_pdfs}
+    new_versions = {}
+    for job in jobs:
+        pdf_path = job["pdf"]
+        if not os.path.exists(pdf_path):
+            logger.warning(f"Timetable not found: {pdf_path}")
+            continue
+        version = extract_version(pdf_path)
+        if version is None:
+            if os.path.abspath(pdf_path) in downloaded:
+                new_versions[pdf_path] = None
+            continue
+        last_version = logged_versions.get(os.path.basename(pdf_path))
+        if version != last_version:
+            logger.info(f"New version of {pdf_path}: {last_version} -> {version}")
+            new_versions[pdf_path] = version
+    return new_versions
+
+
+def poll_once(
+    secrets, default_jobs=None, version_log_file=VERSION_LOG_FILE, **run_options
+):
+    """
+    Download changed PDFs and run the pipeline for the timetables with a new version.
+
+    The versions of successfully synchronized timetables are appended to the
+    version log, so a failed timetable is retried at the next poll.
+
+    Returns:
+    list[dict]: The run summaries, empty if nothing changed.
+    """
+    downloaded_pdfs = sync_timetables(config=secrets)
+    if downloaded_pdfs is None:
+        logger.warning("Could not list the timetable share, skipping this poll.")
+        return []
+
+    jobs = resolve_timetable_jobs(secrets.get("timetables")) or list(
+        default_jobs or []
+    )
+    new_versions = find_new_versions(
+        jobs, read_version_log(version_log_file), downloaded_pdfs
+    )
+    jobs = select_changed_jobs(jobs, new_versions)
+    if not jobs:
+        logger.info("No new timetable version.")
+        return []
+
+    logger.info(f"Processing {len(jobs)} PDF timetable(s).")
+    summaries = run_timetables(
+        jobs,
+        secrets["api_key"],
+        secrets.get("time_zone", "Europe/Berlin"),
+        **run_options,
+    )
+    processed = [
+        (os.path.basename(summary["pdf"]), new_versions[summary["pdf"]])
+        for summary in summaries
+        if summary["status"] == "ok" and new_versions.get(summary["pdf"])
+    ]
+    append_version_log(version_log_file, processed)
+    return summaries
+
+
+def watch_timetables(
+    secrets,
+    interval=POLL_INTERVAL_SECONDS,
+    jitter=POLL_JITTER,
+    max_polls=None,
+    metrics_file=METRICS_FILE,
+    **poll_options,
+):
+    """
+    Poll the timetable share until interrupted and process new versions.
+
+    Runs in the current process, so pandas, Camelot, OpenAI and the Google
+    client are imported once and stay loaded between polls. SIGINT and SIGTERM
+    stop the watcher after the current poll. The metrics accumulate over all
+    polls and the textfile is rewritten after each one.
+    """
+    stop = threading.Event()
+    previous_handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous_handlers[signum] = signal.signal(
+                signum, lambda signum, frame: stop.set()
+            )
+
+    logger.info(f"Watching the timetables every {interval} s.")
+    polls = 0
+    try:
+        while not stop.is_set():
+            try:
+                poll_once(secrets, **poll_options)
+            except Exception as e:
+                logger.exception(f"Poll failed, retrying at the next interval: {e}")
+            metrics.report(metrics_file)
+            polls += 1
+            if max_polls is not None and polls >= max_polls:
+                break
+            delay = next_poll_delay(interval, jitter)
+            logger.info(f"Next poll in {delay:.0f} s.")
+            stop.wait(delay)
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+    logger.info("Stopped watching the timetables.")
@@ -1,17 +1,27 @@
 import os
+import hashlib
 import json
 import logging
 import csv
+import random
+import time
 from datetime import datetime, timedelta
+from itertools import chain
 import pytz
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
-from timetable_scraper.libs.log_config import setup_logger  # Set up the logger
+from timetable_scraper.libs.log_config import setup_logger
+from timetable_scraper.libs.metrics import span, timed
+from timetable_scraper.libs.timetable_event import (
+    BINARY_MAGIC,
+    TimetableEvent,
+    decode_binary,
+    decode_jsonl,
+)
 
-
-setup_logger()
 logger = logging.getLogger(__name__)
 
 # Constants for authentication and calendar settings
@@ -23,16 +33,48 @@ CALENDAR_ID_ELM4 = "618b83df552bfa6b28127fa3e84c59378ebaeb272cebfcab2d0fed975d7f
 
 TIME_ZONE = "Europe/Berlin"
 MAX_RESULTS = 2500
+SYNC_WINDOW_DAYS = 300
+# Partial response: only the fields used for syncing and deleting
+EVENT_FIELDS = (
+    "nextPageToken,"
+    "items(id,summary,location,description,start,end,extendedProperties)"
+)
+EVENT_ID_FIELDS = "nextPageToken,items(id)"
+SYNC_FIELDS = (
+    "nextPageToken,nextSyncToken,"
+    "items(id,status,summary,location,description,start,end,extendedProperties)"
+)
+# Sync tokens and the cached remote snapshot, one file per calendar
+SYNC_STATE_DIR = "cache/calendar_sync"
+# The Calendar API accepts at most 50 operations per batch HTTP request
+BATCH_SIZE = 50
+BATCH_MAX_RETRIES = 5
+BATCH_BACKOFF_SECONDS = 1.0
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+# Private extended property that links a calendar event to its timetable entry
+SYNC_KEY_PROPERTY = "timetable_key"
 
 
 
 
 class GoogleCalendarAPI:
-    def __init__(self, calendar_id, time_zone, dry_run=False):
+    def __init__(
+        self,
+        calendar_id,
+        time_zone,
+        dry_run=False,
+        use_sync_token=True,
+        sync_state_dir=SYNC_STATE_DIR,
+        service=None,
+    ):
         self.calendar_id = calendar_id
         self.time_zone = time_zone
         self.dry_run = dry_run
-        if not dry_run:
+        self.use_sync_token = use_sync_token
+        self.sync_state_dir = sync_state_dir
+        # An already built service (or a fake one) skips the OAuth flow
+        self.service = service
+        if service is None and not dry_run:
             self.service = self.authenticate()
 
     def authenticate(self):
@@ -44,7 +86,7 @@ class GoogleCalendarAPI:
                 try:
                     creds.refresh(Request())
                 except Exception as e:
-                    logging.error(f"Failed to refresh token: {e}")
+                    logger.error(f"Failed to refresh token: {e}")
             else:
                 flow = InstalledAppFlow.from_client_secrets_file(
                     CREDENTIALS_JSON_FILE, SCOPES
@@ -54,104 +96,531 @@ class GoogleCalendarAPI:
                 token.write(creds.to_json())
         return build("calendar", "v3", credentials=creds)
 
-    def fetch_events(self, start_date, end_date):
+    def iter_event_pages(self, start_date, end_date, fields=EVENT_FIELDS):
+        """
+        Yield the events between start_date and end_date page by page.
+
+        Follows nextPageToken, so calendars larger than MAX_RESULTS are listed
+        completely while only one page is held in memory. fields restricts the
+        returned payload (partial response); pass None for full events.
+        """
         if self.dry_run:
-            logging.info("Dry run mode: Not fetching remote events.")
-            return []
-        logging.info(f"Fetching events between {start_date} and {end_date}")
-        events_result = (
-            self.service.events()
-            .list(
-                calendarId=self.calendar_id,
-                timeMin=start_date.isoformat(),
-                timeMax=end_date.isoformat(),
-                maxResults=MAX_RESULTS,
-                singleEvents=True,
-                orderBy="startTime",
-                timeZone=self.time_zone,
+            logger.info("Dry run mode: Not fetching remote events.")
+            return
+        logger.info(f"Fetching events between {start_date} and {end_date}")
+        page_token = None
+        page_count = 0
+        while True:
+            request_kwargs = {
+                "calendarId": self.calendar_id,
+                "timeMin": start_date.isoformat(),
+                "timeMax": end_date.isoformat(),
+                "maxResults": MAX_RESULTS,
+                "singleEvents": True,
+                "orderBy": "startTime",
+                "timeZone": self.time_zone,
+                "pageToken": page_token,
+            }
+            if fields:
+                request_kwargs["fields"] = fields
+            events_result = self.service.events().list(**request_kwargs).execute()
+            page_count += 1
+            yield events_result.get("items", [])
+            page_token = events_result.get("nextPageToken")
+            if not page_token:
+                break
+        logger.info(f"Fetched {page_count} page(s) of events")
+
+    def iter_events(self, start_date, end_date, fields=EVENT_FIELDS):
+        """Yield the events between start_date and end_date lazily."""
+        for page in self.iter_event_pages(start_date, end_date, fields):
+            yield from page
+
+    def fetch_events(self, start_date, end_date, fields=EVENT_FIELDS):
+        return list(self.iter_events(start_date, end_date, fields))
+
+    def _sync_state_path(self):
+        calendar_hash = hashlib.sha1(self.calendar_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.sync_state_dir, f"{calendar_hash[:16]}.json")
+
+    def load_sync_state(self):
+        path = self._sync_state_path()
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable sync state {path}: {e}")
+            return {}
+
+    def save_sync_state(self, state):
+        path = self._sync_state_path()
+        os.makedirs(self.sync_state_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(state, file)
+        os.replace(tmp_path, path)
+
+    def _iter_sync_pages(self, **list_kwargs):
+        page_token = None
+        while True:
+            result = (
+                self.service.events()
+                .list(
+                    calendarId=self.calendar_id,
+                    singleEvents=True,
+                    maxResults=MAX_RESULTS,
+                    timeZone=self.time_zone,
+                    fields=SYNC_FIELDS,
+                    pageToken=page_token,
+                    **list_kwargs,
+                )
+                .execute()
             )
-            .execute()
-        )
-        return events_result.get("items", [])
+            yield result
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                break
+
+    def fetch_remote_snapshot(self):
+        """
+        Return all remote events, using the stored sync token when possible.
+
+        The first run lists the whole calendar and stores the events together
+        with the nextSyncToken. Later runs only fetch the changes since then and
+        apply them to the stored snapshot; an expired token (410) falls back to
+        a full listing.
+        """
+        if self.dry_run:
+            logger.info("Dry run mode: Not fetching remote events.")
+            return []
+        state = self.load_sync_state()
+        events = state.get("events", {})
+        sync_token = state.get("sync_token")
+        next_sync_token = None
+
+        if sync_token:
+            try:
+                changes = 0
+                for result in self._iter_sync_pages(syncToken=sync_token):
+                    for item in result.get("items", []):
+                        changes += 1
+                        if item.get("status") == "cancelled":
+                            events.pop(item["id"], None)
+                        else:
+                            events[item["id"]] = item
+                    next_sync_token = result.get("nextSyncToken", next_sync_token)
+                logger.info(f"Incremental sync fetched {changes} changed events")
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                logger.warning("Sync token expired, falling back to a full listing.")
+                sync_token = None
+
+        if not sync_token:
+            events = {}
+            for result in self._iter_sync_pages():
+                for item in result.get("items", []):
+                    events[item["id"]] = item
+                next_sync_token = result.get("nextSyncToken", next_sync_token)
+            logger.info(f"Full sync fetched {len(events)} events")
+
+        self.save_sync_state({"sync_token": next_sync_token, "events": events})
+        return list(events.values())
+
+    def list_remote_events(self, start_date, end_date):
+        """
+        Remote events to match local events against.
+
+        With sync tokens this is the whole snapshot, events outside start_date
+        and end_date included; otherwise the events listed in that window.
+        """
+        if not self.use_sync_token:
+            return self.iter_events(start_date, end_date)
+        return self.fetch_remote_snapshot()
 
     def prepare_event_data(self, event):
-        try:
-            # Convert timestamp to date
-            date_timestamp = event["date"]
-            date = datetime.fromtimestamp(date_timestamp / 1000, pytz.utc)
+        """
+        Build the Calendar API body of an event.
 
-            # Combine date with start and end times
-            start_time = datetime.strptime(event["start_time"], "%H:%M:%S").time()
-            end_time = datetime.strptime(event["end_time"], "%H:%M:%S").time()
+        Args:
+        event (TimetableEvent | dict): The event; dicts (e.g. records of an
+        events JSON file) are converted with TimetableEvent.from_dict.
+        """
+        try:
+            if not isinstance(event, TimetableEvent):
+                event = TimetableEvent.from_dict(event)
 
             # Localize the datetime objects
             local_tz = pytz.timezone(TIME_ZONE)
             start_datetime = local_tz.localize(
-                datetime.combine(date.date(), start_time)
+                datetime.combine(event.date, event.start_time)
             )
-            end_datetime = local_tz.localize(datetime.combine(date.date(), end_time))
-
-            # Ensure lecturer is a list
-            lecturer_field = event["lecturer"]
-            if isinstance(lecturer_field, str):
-                try:
-                    lecturer_list = json.loads(lecturer_field.replace("'", '"'))
-                except json.JSONDecodeError:
-                    logging.error(f"Failed to decode lecturer field: {lecturer_field}")
-                    lecturer_list = [lecturer_field]
-            else:
-                lecturer_list = lecturer_field
-
-            # Get event details and ensure it's not None
-            details = event.get("details") or ""
+            end_datetime = local_tz.localize(datetime.combine(event.date, event.end_time))
 
             # Conditionally include the comma delimiter
-            summary = f"{event['course']}"
-            if details:
-                summary += f", {details}"
+            summary = event.course
+            if event.details:
+                summary += f", {event.details}"
+            description = ", ".join(event.lecturer)
 
             return {
                 "summary": summary,
-                "location": event.get("location", ""),
+                "location": event.location,
                 "start": {
                     "dateTime": start_datetime.isoformat(),
                     "timeZone": TIME_ZONE,
                 },
                 "end": {"dateTime": end_datetime.isoformat(), "timeZone": TIME_ZONE},
-                "description": ", ".join(lecturer_list),
+                "description": description,
+                "extendedProperties": {
+                    "private": {
+                        SYNC_KEY_PROPERTY: event_sync_key(
+                            start_datetime.isoformat(),
+                            summary,
+                            event.location,
+                            description,
+                        )
+                    }
+                },
             }
         except Exception as e:
-            logging.error(f"Error preparing event data: {event} - {e}")
+            logger.error(f"Error preparing event data: {event} - {e}")
             return None
 
+    @timed()
     def create_event(self, event):
         event_data = self.prepare_event_data(event)
         if event_data:
-            if self.dry_run:
-                logging.info(f"Dry run mode: Prepared event data: {event_data}")
-                return event_data
-            else:
-                created_event = (
-                    self.service.events()
-                    .insert(calendarId=self.calendar_id, body=event_data)
-                    .execute()
-                )
-                logging.info(f'Event created: {created_event["summary"]}')
-                return created_event
+            return self.insert_event_data(event_data)
         else:
-            logging.error("Failed to create event due to preparation error")
+            logger.error("Failed to create event due to preparation error")
 
+    def insert_event_data(self, event_data):
+        if self.dry_run:
+            logger.debug(f"Dry run mode: Prepared event data: {event_data}")
+            return event_data
+        created_event = (
+            self.service.events()
+            .insert(calendarId=self.calendar_id, body=event_data)
+            .execute()
+        )
+        logger.debug(f'Event created: {created_event["summary"]}')
+        return created_event
+
+    @timed()
+    def patch_event(self, event_id, event_data):
+        if self.dry_run:
+            logger.debug(f"Dry run mode: Would patch event with ID: {event_id}")
+            return event_data
+        patched_event = (
+            self.service.events()
+            .patch(calendarId=self.calendar_id, eventId=event_id, body=event_data)
+            .execute()
+        )
+        logger.debug(f'Event patched: {patched_event["summary"]}')
+        return patched_event
+
+    @timed()
     def delete_event(self, event_id):
         if self.dry_run:
-            logging.info(f"Dry run mode: Would delete event with ID: {event_id}")
+            logger.debug(f"Dry run mode: Would delete event with ID: {event_id}")
         else:
             self.service.events().delete(
                 calendarId=self.calendar_id, eventId=event_id
             ).execute()
-            logging.info(f"Deleted event with ID: {event_id}")
+            logger.debug(f"Deleted event with ID: {event_id}")
+
+    def execute_batch(self, request_factories):
+        """
+        Execute API requests as batch HTTP requests of up to BATCH_SIZE operations.
+
+        Sub-requests that fail with a rate-limit error (403/429) are rebuilt and
+        retried with exponential backoff, so request_factories are callables
+        returning a fresh HttpRequest.
+
+        Returns:
+        list: One (response, exception) tuple per request, in input order.
+        """
+        with span("calendar_batch") as stage:
+            return self._execute_batch(request_factories, stage)
+
+    def _execute_batch(self, request_factories, stage):
+        results = [(None, None)] * len(request_factories)
+        pending = list(range(len(request_factories)))
+
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            if attempt:
+                stage.add_retry(len(pending))
+                delay = BATCH_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                delay += random.uniform(0, BATCH_BACKOFF_SECONDS)
+                logger.warning(
+                    f"Retrying {len(pending)} rate-limited requests in {delay:.1f}s "
+                    f"(attempt {attempt}/{BATCH_MAX_RETRIES})."
+                )
+                time.sleep(delay)
+            rate_limited = []
+
+            def callback(request_id, response, exception):
+                index = int(request_id)
+                results[index] = (response, exception)
+                if exception is not None and _is_rate_limit_error(exception):
+                    rate_limited.append(index)
+
+            for chunk_start in range(0, len(pending), BATCH_SIZE):
+                chunk = pending[chunk_start : chunk_start + BATCH_SIZE]
+                batch = self.service.new_batch_http_request(callback=callback)
+                for index in chunk:
+                    batch.add(request_factories[index](), request_id=str(index))
+                try:
+                    batch.execute()
+                except HttpError as e:
+                    for index in chunk:
+                        callback(str(index), None, e)
+
+            pending = sorted(rate_limited)
+            if not pending:
+                break
+
+        failed = sum(1 for _, exception in results if exception is not None)
+        stage.error = failed > 0
+        logger.info(f"Executed {len(results)} requests in batches, {failed} failed.")
+        return results
 
+    def insert_events_batch(self, events_data):
+        if self.dry_run:
+            logger.info(f"Dry run mode: Would insert {len(events_data)} events.")
+            return [(event_data, None) for event_data in events_data]
+        return self.execute_batch(
+            [
+                lambda body=event_data: self.service.events().insert(
+                    calendarId=self.calendar_id, body=body
+                )
+                for event_data in events_data
+            ]
+        )
+
+    def patch_events_batch(self, patches):
+        """Patch events given as (event_id, event_data) tuples."""
+        if self.dry_run:
+            logger.info(f"Dry run mode: Would patch {len(patches)} events.")
+            return [(event_data, None) for _, event_data in patches]
+        return self.execute_batch(
+            [
+                lambda event_id=event_id, body=event_data: self.service.events().patch(
+                    calendarId=self.calendar_id, eventId=event_id, body=body
+                )
+                for event_id, event_data in patches
+            ]
+        )
+
+    def delete_events_batch(self, event_ids):
+        if self.dry_run:
+            logger.info(f"Dry run mode: Would delete {len(event_ids)} events.")
+            return [(None, None) for _ in event_ids]
+        return self.execute_batch(
+            [
+                lambda event_id=event_id: self.service.events().delete(
+                    calendarId=self.calendar_id, eventId=event_id
+                )
+                for event_id in event_ids
+            ]
+        )
+
+
+def _starts_within(remote_event, start_date, end_date):
+    start = remote_event.get("start", {})
+    start_value = start.get("dateTime") or start.get("date")
+    if not start_value:
+        return False
+    start_datetime = datetime.fromisoformat(start_value)
+    if start_datetime.tzinfo is None:
+        start_datetime = pytz.timezone(TIME_ZONE).localize(start_datetime)
+    return start_date <= start_datetime <= end_date
+
+
+def _is_rate_limit_error(exception):
+    if not isinstance(exception, HttpError):
+        return False
+    if exception.resp.status == 429:
+        return True
+    content = exception.content or b""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    return exception.resp.status == 403 and any(
+        reason in content for reason in RATE_LIMIT_REASONS
+    )
+
+
+def _log_batch_failures(action, results):
+    for response, exception in results:
+        if exception is not None:
+            logger.error(f"Failed to {action} event: {exception}")
+
+
+def event_sync_key(start_datetime, summary, location="", description=""):
+    """
+    Stable key of a timetable entry: the same course at the same start time, room
+    and lecturers.
+
+    Entries of one slot that differ only in room or lecturers (e.g. parallel
+    groups) get different keys, whatever order they are synced in.
+    """
+    fields = "|".join([start_datetime, summary, location or "", description or ""])
+    return hashlib.sha1(fields.encode("utf-8")).hexdigest()
+
+
+def _get_sync_key(remote_event):
+    return (
+        remote_event.get("extendedProperties", {})
+        .get("private", {})
+        .get(SYNC_KEY_PROPERTY)
+    )
+
+
+def _event_differs(remote_event, event_data):
+    """Compare the fields that are written by prepare_event_data."""
+    return (
+        remote_event.get("summary", "") != event_data["summary"]
+        or remote_event.get("location", "") != event_data["location"]
+        or remote_event.get("description", "") != event_data["description"]
+        or remote_event.get("start", {}).get("dateTime")
+        != event_data["start"]["dateTime"]
+        or remote_event.get("end", {}).get("dateTime") != event_data["end"]["dateTime"]
+    )
+
+
+def _insert_events(calendar_api, events_data, batch):
+    if batch:
+        _log_batch_failures("insert", calendar_api.insert_events_batch(events_data))
+    else:
+        for event_data in events_data:
+            calendar_api.insert_event_data(event_data)
+
+
+def _patch_events(calendar_api, patches, batch):
+    if batch:
+        _log_batch_failures("patch", calendar_api.patch_events_batch(patches))
+    else:
+        for event_id, event_data in patches:
+            calendar_api.patch_event(event_id, event_data)
+
+
+def sync_events(calendar_api, local_events, batch=False):
+    """
+    Bring the calendar in line with the local events using as few API calls as possible.
+
+    Remote events are fetched once (incrementally via the stored sync token if
+    enabled) and matched to local events by the key stored in their private
+    extended properties. Only missing events are inserted, changed events are
+    patched and remote events without a local counterpart (including events
+    created before keys existed) are deleted if they start within
+    SYNC_WINDOW_DAYS of today.
+    With batch=True the operations are sent as batch HTTP requests.
+
+    local_events may be a generator: inserts and patches are sent every
+    BATCH_SIZE events while it is consumed, deletions once it is exhausted (so
+    a failing event stream never deletes anything).
+
+    Returns:
+    dict: Number of inserted, patched, deleted and unchanged events.
+    """
+    counts = {"inserted": 0, "patched": 0, "deleted": 0, "unchanged": 0}
+    start_date = datetime.now(pytz.timezone(TIME_ZONE)) - timedelta(
+        days=SYNC_WINDOW_DAYS
+    )
+    end_date = datetime.now(pytz.timezone(TIME_ZONE)) + timedelta(
+        days=SYNC_WINDOW_DAYS
+    )
+
+    remote_by_key = {}
+    stale_events = []
+    for remote_event in calendar_api.list_remote_events(start_date, end_date):
+        key = _get_sync_key(remote_event)
+        if key and key not in remote_by_key:
+            remote_by_key[key] = remote_event
+        else:
+            stale_events.append(remote_event)
+
+    to_insert = []
+    to_patch = []
+    seen_keys = set()
+    for event in local_events:
+        event_data = calendar_api.prepare_event_data(event)
+        if not event_data:
+            logger.error("Failed to sync event due to preparation error")
+            continue
+        key = _get_sync_key(event_data)
+        # Identical entries in the same slot get distinct keys; as all synced
+        # fields are equal, it does not matter which one gets which suffix
+        occurrence = 1
+        while key in seen_keys:
+            occurrence += 1
+            key = f"{_get_sync_key(event_data)}-{occurrence}"
+        event_data["extendedProperties"]["private"][SYNC_KEY_PROPERTY] = key
+        seen_keys.add(key)
+
+        remote_event = remote_by_key.pop(key, None)
+        if remote_event is None:
+            to_insert.append(event_data)
+        elif _event_differs(remote_event, event_data):
+            to_patch.append((remote_event["id"], event_data))
+        else:
+            counts["unchanged"] += 1
+
+        if len(to_insert) >= BATCH_SIZE:
+            _insert_events(calendar_api, to_insert, batch)
+            counts["inserted"] += len(to_insert)
+            to_insert = []
+        if len(to_patch) >= BATCH_SIZE:
+            _patch_events(calendar_api, to_patch, batch)
+            counts["patched"] += len(to_patch)
+            to_patch = []
+
+    _insert_events(calendar_api, to_insert, batch)
+    _patch_events(calendar_api, to_patch, batch)
+    counts["inserted"] += len(to_insert)
+    counts["patched"] += len(to_patch)
+
+    # Events outside the window are matched above, but never deleted
+    to_delete = [
+        remote_event["id"]
+        for remote_event in stale_events + list(remote_by_key.values())
+        if _starts_within(remote_event, start_date, end_date)
+    ]
+    if batch:
+        _log_batch_failures("delete", calendar_api.delete_events_batch(to_delete))
+    else:
+        for event_id in to_delete:
+            calendar_api.delete_event(event_id)
+    counts["deleted"] = len(to_delete)
+
+    logger.info(
+        f"Calendar sync finished: {counts['inserted']} inserted, "
+        f"{counts['patched']} patched, {counts['deleted']} deleted, "
+        f"{counts['unchanged']} unchanged."
+    )
+    return counts
+
+
+def create_all_events(calendar_api, local_events, batch=False):
+    if batch:
+        # Insert every BATCH_SIZE events, so local_events can be a long generator
+        created_events = []
+        events_data = []
+        for event in local_events:
+            event_data = calendar_api.prepare_event_data(event)
+            if event_data:
+                events_data.append(event_data)
+            else:
+                logger.error("Failed to create event due to preparation error")
+            if len(events_data) >= BATCH_SIZE:
+                created_events.extend(_insert_batch(calendar_api, events_data))
+                events_data = []
+        created_events.extend(_insert_batch(calendar_api, events_data))
+        return created_events
 
-def create_all_events(calendar_api, local_events):
     created_events = []
     for event in local_events:
         created_event = calendar_api.create_event(event)
@@ -160,16 +629,55 @@ def create_all_events(calendar_api, local_events):
     return created_events
 
 
-def delete_all_events(calendar_api):
-    start_date = datetime.now(pytz.timezone(TIME_ZONE)) - timedelta(days=300)
-    end_date = datetime.now(pytz.timezone(TIME_ZONE)) + timedelta(days=300)
-    logging.info(f"Fetching events between {start_date} and {end_date}")
-
-    remote_events = calendar_api.fetch_events(start_date, end_date)
-
-    for event in remote_events:
-        calendar_api.delete_event(event["id"])
-    logging.info("All events deleted successfully")
+def _insert_batch(calendar_api, events_data):
+    if not events_data:
+        return []
+    results = calendar_api.insert_events_batch(events_data)
+    _log_batch_failures("create", results)
+    return [response for response, exception in results if exception is None]
+
+
+def delete_all_events(calendar_api, batch=False):
+    start_date = datetime.now(pytz.timezone(TIME_ZONE)) - timedelta(
+        days=SYNC_WINDOW_DAYS
+    )
+    end_date = datetime.now(pytz.timezone(TIME_ZONE)) + timedelta(
+        days=SYNC_WINDOW_DAYS
+    )
+    logger.info(f"Fetching events between {start_date} and {end_date}")
+
+    # Deletion starts with the first page instead of waiting for the full listing
+    for page in calendar_api.iter_event_pages(start_date, end_date, EVENT_ID_FIELDS):
+        if batch:
+            results = calendar_api.delete_events_batch([event["id"] for event in page])
+            _log_batch_failures("delete", results)
+        else:
+            for event in page:
+                calendar_api.delete_event(event["id"])
+    logger.info("All events deleted successfully")
+
+
+def read_events_file(events_file):
+    """
+    Yield the events of an events file one by one.
+
+    JSON Lines files (one event per line, as written by write_events_jsonl) are
+    streamed. Binary files (as written by save_events_binary) and older files
+    with a single JSON array of records are loaded at once and converted.
+    """
+    with open(events_file, "rb") as file:
+        if file.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            file.seek(0)
+            yield from decode_binary(file.read())
+            return
+    with open(events_file, "r", encoding="utf-8") as file:
+        first_line = file.readline()
+        if first_line.lstrip().startswith("["):
+            file.seek(0)
+            for record in json.load(file):
+                yield TimetableEvent.from_dict(record)
+        else:
+            yield from decode_jsonl(chain([first_line], file))
 
 
 def save_events_to_csv(events, filename):
@@ -178,29 +686,40 @@ def save_events_to_csv(events, filename):
         dict_writer = csv.DictWriter(output_file, fieldnames=keys)
         dict_writer.writeheader()
         dict_writer.writerows(events)
-    logging.info(f"Dry run mode: Events saved to {filename}")
-
-
-def main(dry_run=False):
-    calendar_api = GoogleCalendarAPI(CALENDAR_ID_ELM4, TIME_ZONE, dry_run)
-    logging.info("Authenticated with Google Calendar API.")
-
-    with open("output/final_events.json", "r") as file:
-        try:
-            local_events = json.load(file)
-            logging.info(f"Found {len(local_events)} events in the timetable")
-        except json.JSONDecodeError as e:
-            logging.error(f"Error reading events.json: {e}")
-            return
-
-    if dry_run:
-        created_events = create_all_events(calendar_api, local_events)
-        save_events_to_csv(created_events, "output/dry_run_output.csv")
-    else:
-        delete_all_events(calendar_api)
-        create_all_events(calendar_api, local_events)
+    logger.info(f"Dry run mode: Events saved to {filename}")
+
+
+def main(
+    dry_run=False,
+    events_file="output/final_events.jsonl",
+    calendar_id=CALENDAR_ID_ELM4,
+    time_zone=TIME_ZONE,
+):
+    """
+    Sync the events of an events file (see read_events_file) to a calendar.
+
+    The file is streamed, so syncing starts with the first event.
+
+    Returns:
+    The created events in dry run mode, the sync counts otherwise, or None if
+    the events file could not be read.
+    """
+    calendar_api = GoogleCalendarAPI(calendar_id, time_zone, dry_run)
+    logger.info("Authenticated with Google Calendar API.")
+    local_events = read_events_file(events_file)
+    try:
+        if dry_run:
+            created_events = create_all_events(calendar_api, local_events)
+            save_events_to_csv(created_events, "output/dry_run_output.csv")
+            return created_events
+        return sync_events(calendar_api, local_events, batch=True)
+    except (OSError, ValueError, KeyError) as e:
+        # json.JSONDecodeError is a ValueError
+        logger.error(f"Error reading {events_file}: {e}")
+        return None
 
 
 if __name__ == "__main__":
+    setup_logger()
     dry_run = False  # Set to False to perform actual operations
     main(dry_run)